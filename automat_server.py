@@ -0,0 +1,59 @@
+import socketserver
+import time
+
+from transport import ACK, HEADER, body_size, recv_exactly, unpack_coordinates
+
+# local stand-in for the automat that receives the coordinates of
+# transport.AutomatConnection, to test the wire format and the throughput
+
+
+class AutomatHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        start, n_messages, n_bytes = time.perf_counter(), 0, 0
+        print("connection from {}:{}".format(*self.client_address))
+        while True:
+            try:
+                header = recv_exactly(self.request, HEADER.size)
+                body = recv_exactly(self.request, body_size(header))
+                sample, coords = unpack_coordinates(header, body)
+                if server.ack:
+                    self.request.sendall(ACK.pack(sample))
+            except OSError:
+                break
+            n_messages += 1
+            n_bytes += len(header) + len(body)
+            if server.verbose:
+                print("sample {}: {} waypoints".format(sample, coords.shape[0]))
+                print(coords)
+        elapsed = time.perf_counter() - start
+        print("connection closed, {} messages, {:.1f} kB in {:.2f} s".format(
+            n_messages, n_bytes / 1e3, elapsed))
+
+
+class AutomatServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, ack=False, verbose=True):
+        super().__init__(address, AutomatHandler)
+        self.ack = ack
+        self.verbose = verbose
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="stand-in automat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10509)
+    parser.add_argument("--ack", action="store_true",
+                        help="echo the sample number after every message")
+    parser.add_argument("--quiet", action="store_true",
+                        help="do not print the received coordinates")
+    args = parser.parse_args()
+
+    with AutomatServer((args.host, args.port), args.ack,
+                       not args.quiet) as server:
+        print("automat listening on {}:{}".format(args.host, args.port))
+        server.serve_forever()
@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+
+
+def average_frames(frames, method="mean"):
+    """ combines several raw uint8 frames into one low noise frame
+
+    The mean is accumulated in a uint32 image like in
+    BackgroundModel.from_frames, so only the current frame is held in
+    memory. The median has to keep all frames,
+    but raw bayer frames are a third of the size of the BGR images.
+
+    Arguments:
+        frames {iterable of numpy array, uint8} -- raw frames of the same size
+
+    Keyword Arguments:
+        method {str} -- "mean" or "median" (default: {"mean"})
+
+    Returns:
+        numpy array, uint8 -- combined frame
+    """
+    if method == "median":
+        return np.median(np.stack(list(frames)), axis=0).astype(np.uint8)
+    elif method != "mean":
+        raise ValueError("unknown method {}".format(method))
+    acc, n = None, 0
+    for frame in frames:
+        if acc is None:
+            acc = np.zeros(frame.shape, dtype=np.uint32)
+        np.add(acc, frame, out=acc)
+        n += 1
+    acc += n // 2
+    acc //= n
+    return acc.astype(np.uint8)
+
+
+class BackgroundModel:
+    """per pixel mean and variance of the empty plate
+
+    The model is kept across samples and saved to disk, so the background
+    only has to be captured again when the setup changes.
+    image is the BGR mean image, std the per pixel and channel standard
+    deviation of the sensor noise in 8.8 fixed point (uint16, gray levels
+    times 256), which keeps the saved model at a third of the float size.
+    """
+
+    def __init__(self, image, std, n_frames, timestamp=None):
+        self.image = image
+        self.std = std
+        self.n_frames = n_frames
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @classmethod
+    def from_frames(cls, frames, demosaic=None):
+        """ accumulates raw uint8 frames in fixed point sums
+
+        Arguments:
+            frames {iterable of numpy array, uint8} -- raw frames of the same size
+
+        Keyword Arguments:
+            demosaic {callable} -- converts a raw uint8 or uint16 frame into a
+                                   BGR image (default: {None})
+
+        Returns:
+            BackgroundModel
+        """
+        acc, acc_sq, n = None, None, 0
+        for frame in frames:
+            if acc is None:
+                acc = np.zeros(frame.shape, dtype=np.uint32)
+                acc_sq = np.zeros(frame.shape, dtype=np.uint32)
+            np.add(acc, frame, out=acc)
+            np.add(acc_sq, np.square(frame, dtype=np.uint32), out=acc_sq)
+            n += 1
+        mean = acc / n
+        var = np.maximum(acc_sq / n - mean ** 2, 0)
+        image = np.rint(mean).astype(np.uint8)
+        # the standard deviation is passed through the demosaicing in 8.8
+        # fixed point
+        std = np.clip(np.rint(np.sqrt(var) * 256), 0, 65535).astype(np.uint16)
+        if demosaic is not None:
+            image, std = demosaic(image), demosaic(std)
+        return cls(image, std, n)
+
+    def save(self, filename):
+        """ writes the model to a .npz filename or an open binary file """
+        np.savez(filename, image=self.image, std=self.std,
+                 n_frames=self.n_frames, timestamp=self.timestamp)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            std = data["std"]
+            if std.dtype != np.uint16:
+                # models saved with the float standard deviation
+                std = np.clip(np.rint(std * 256), 0, 65535).astype(np.uint16)
+            return cls(data["image"], std, int(data["n_frames"]),
+                       float(data["timestamp"]))
@@ -0,0 +1,175 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import numpy as np
+from background_model import BackgroundModel
+from calibration import Calibration
+from coordinate_io import write_coordinates
+from file_writer import FORMATS, load_image
+from path_generator import PathGenerator
+from path_planner import path_length
+
+# re-plans archived samples (textiles/<sample>.png with
+# background/<sample>.png, or any other format of FileWriter) with new
+# parameters on a process pool
+
+# extensions of the image formats, tried in this order
+IMAGE_EXTENSIONS = tuple(extension for extension, _ in FORMATS.values())
+
+_generator = None
+
+
+def _init_worker(calibration_file):
+    global _generator
+    cv2.setNumThreads(1)
+    # every sample is planned once, a larger cache would only keep the
+    # masks of previous samples alive
+    _generator = PathGenerator(Calibration.from_yaml(calibration_file),
+                               cache_size=1)
+
+
+def load_background(filename):
+    if filename.endswith(".npz"):
+        return BackgroundModel.load(filename).image
+    return load_image(filename)
+
+
+def plan_sample(sample, textile_file, background_file, output, params,
+                save_image=True, coordinate_format="txt", dtype="float32"):
+    """ plans one sample and writes its coordinates (and visualization)
+
+    Returns:
+        (str, int, float, float) -- sample, number of waypoints, path length
+                                    in mm and runtime in s
+    """
+    start = time.perf_counter()
+    img_obj = load_image(textile_file)
+    img_bg = load_background(background_file)
+    if img_obj is None or img_bg is None:
+        raise FileNotFoundError("images of sample {} not readable".format(sample))
+    vis_img, world_coords, _ = _generator.run(img_obj, img_bg, **params)
+    if coordinate_format == "wpt":
+        write_coordinates(os.path.join(output, sample + ".wpt"), world_coords,
+                          sample=sample, calibration=_generator.calibration,
+                          params=params, dtype=dtype)
+    else:
+        np.savetxt(os.path.join(output, sample + ".txt"), world_coords,
+                   fmt="%10.5f")
+    if save_image:
+        cv2.imwrite(os.path.join(output, sample + ".png"), vis_img,
+                    [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    return (sample, world_coords.shape[0], path_length(world_coords),
+            time.perf_counter() - start)
+
+
+def find_image(directory, sample):
+    """ image file of sample in the first format that exists, the .png name
+        if there is none
+    """
+    for extension in IMAGE_EXTENSIONS:
+        filename = os.path.join(directory, sample + extension)
+        if os.path.exists(filename):
+            return filename
+    return os.path.join(directory, sample + IMAGE_EXTENSIONS[0])
+
+
+def find_samples(patterns, background_dir, background=None):
+    """ resolves sample names or glob patterns of textile images into
+        (sample, textile file, background file) tuples, a sample that was
+        saved in several formats is planned once from the first format
+    """
+    samples = {}
+    for pattern in patterns:
+        files = [name for name in glob.glob(pattern)
+                 if os.path.splitext(name)[1] in IMAGE_EXTENSIONS]
+        files.sort(key=lambda name: (os.path.splitext(name)[0],
+                                     IMAGE_EXTENSIONS.index(
+                                         os.path.splitext(name)[1])))
+        if not files:
+            files = [find_image("textiles", pattern)]
+        for textile_file in files:
+            sample = os.path.splitext(os.path.basename(textile_file))[0]
+            if sample in samples:
+                continue
+            background_file = background or find_image(background_dir, sample)
+            samples[sample] = (sample, textile_file, background_file)
+    return list(samples.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="re-plan archived samples in parallel")
+    parser.add_argument("samples", nargs="*", default=["textiles/*"],
+                        help="sample names or glob patterns of textile images")
+    parser.add_argument("--background-dir", default="background")
+    parser.add_argument("--background", default=None,
+                        help="one background image or .npz model for all samples")
+    parser.add_argument("--output", default="batch")
+    parser.add_argument("--calibration", default="calibration_matrix.yaml")
+    parser.add_argument("--spacing", type=float, default=20)
+    parser.add_argument("--dilation", type=float, default=10)
+    parser.add_argument("--threshold", type=float, default=50)
+    parser.add_argument("--planner", default="boustrophedon",
+                        choices=("boustrophedon", "meander"))
+    parser.add_argument("--resolution", type=float, default=None,
+                        help="plan on a metric grid with cells of this size in mm")
+    parser.add_argument("--align", action="store_true",
+                        help="turn the rows to the direction with the fewest rows")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="merge waypoints within this many mm of a straight path")
+    parser.add_argument("--format", default="txt", choices=("txt", "wpt"),
+                        help="text coordinates or binary waypoint files")
+    parser.add_argument("--dtype", default="float32", choices=("float32", "int32"),
+                        help="values of the waypoint files, int32 in 1/100 mm")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--no-images", action="store_true",
+                        help="only write the coordinates")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    samples = find_samples(args.samples, args.background_dir, args.background)
+    params = {"spacing": args.spacing, "dilation": args.dilation,
+              "bg_thresh": args.threshold, "planner": args.planner,
+              "resolution": args.resolution, "align": args.align,
+              "tolerance": args.tolerance}
+
+    # at most two samples per worker are in flight, which bounds the memory
+    # to a few images per process however many samples are planned
+    max_pending = 2 * args.workers
+    start = time.perf_counter()
+    done, failed = [], []
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                             initargs=(args.calibration,)) as pool:
+        pending = {}
+        queue = iter(samples)
+        while True:
+            for sample in queue:
+                future = pool.submit(plan_sample, *sample, args.output, params,
+                                     not args.no_images, args.format, args.dtype)
+                pending[future] = sample[0]
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                sample = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed.append(sample)
+                    print("{}: failed ({})".format(sample, e))
+                    continue
+                done.append(result)
+                print("{}: {} waypoints, {:.0f} mm, {:.2f} s".format(*result))
+    elapsed = time.perf_counter() - start
+
+    print("{} samples planned, {} failed in {:.1f} s with {} workers".format(
+        len(done), len(failed), elapsed, args.workers))
+    if done:
+        print("{:.2f} samples/s, {:.2f} s per sample and worker".format(
+            len(done) / elapsed, np.mean([r[3] for r in done])))
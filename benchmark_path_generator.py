@@ -0,0 +1,140 @@
+import argparse
+import datetime
+import json
+import platform
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from calibration import Calibration
+from path_generator import (draw_path, margin_mask, pixel2world, pixel_size,
+                            plan_rows, segment_mask_bg)
+from synthetic_scenes import SHAPES, make_scene
+
+# times every stage of path_generation on synthetic scenes across parameter
+# sweeps and stores the results as JSON to compare runs
+
+SWEEP = {"noise": (2., 8.), "bg_thresh": (30, 50), "dilation": (1, 10, 50),
+         "spacing": (10, 20, 50)}
+QUICK_SWEEP = {"noise": (4.,), "bg_thresh": (50,), "dilation": (10,),
+               "spacing": (20,)}
+
+
+def measure(function, *args, repeats=3):
+    """ median runtime in ms, peak traced memory in MB and the result """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return np.median(times) * 1000, peak / 1e6, result
+
+
+def run(calibration, sweep, shapes=SHAPES, repeats=3):
+    results = []
+
+    def record(stage, runtime, peak, **params):
+        results.append(dict(params, stage=stage, time_ms=round(runtime, 3),
+                            peak_mb=round(peak, 3)))
+
+    for shape in shapes:
+        for noise in sweep["noise"]:
+            img_bg, img_obj, _ = make_scene(shape, noise)
+            pixmm = pixel_size(calibration, img_obj.shape)
+            for bg_thresh in sweep["bg_thresh"]:
+                params = {"scene": shape, "noise": noise, "bg_thresh": bg_thresh}
+                runtime, peak, img_mask = measure(
+                    segment_mask_bg, img_bg, img_obj, bg_thresh, repeats=repeats)
+                record("segmentation", runtime, peak, **params)
+                for dilation in sweep["dilation"]:
+                    params["dilation"] = dilation
+                    runtime, peak, region = measure(
+                        margin_mask, img_mask, dilation / pixmm, repeats=repeats)
+                    record("margin", runtime, peak, **params)
+                    for spacing in sweep["spacing"]:
+                        params["spacing"] = spacing
+                        runtime, peak, waypoints = measure(
+                            plan_rows, region, pixmm, spacing, repeats=repeats)
+                        record("scanlines", runtime, peak,
+                               waypoints=len(waypoints), **params)
+                        pixel_coords = np.asarray(waypoints, dtype=np.float64)
+                        runtime, peak, _ = measure(
+                            pixel2world, pixel_coords, calibration,
+                            repeats=repeats)
+                        record("pixel2world", runtime, peak, **params)
+                        runtime, peak, _ = measure(
+                            draw_path, img_obj, pixel_coords, repeats=repeats)
+                        record("draw", runtime, peak, **params)
+                    del params["spacing"]
+    return results
+
+
+def _key(result):
+    return tuple((k, v) for k, v in sorted(result.items())
+                 if k not in ("time_ms", "peak_mb", "waypoints"))
+
+
+def compare(results, previous):
+    """ ratio of the total time per stage over the configurations that both
+        runs measured
+    """
+    previous = {_key(r): r["time_ms"] for r in previous}
+    now, before = {}, {}
+    for r in results:
+        if _key(r) in previous:
+            now[r["stage"]] = now.get(r["stage"], 0.) + r["time_ms"]
+            before[r["stage"]] = before.get(r["stage"], 0.) + previous[_key(r)]
+    return {stage: now[stage] / before[stage]
+            for stage in now if before[stage] > 0}
+
+
+def summarize(results):
+    """ total time and maximum peak memory per stage """
+    summary = {}
+    for r in results:
+        stage = summary.setdefault(r["stage"], {"time_ms": 0., "peak_mb": 0.})
+        stage["time_ms"] += r["time_ms"]
+        stage["peak_mb"] = max(stage["peak_mb"], r["peak_mb"])
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="benchmark the stages of path_generation")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None,
+                        help="JSON file of a previous run")
+    parser.add_argument("--calibration", default="calibration_matrix.yaml")
+    parser.add_argument("--shapes", nargs="*", default=SHAPES, choices=SHAPES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--quick", action="store_true",
+                        help="only one value per parameter")
+    args = parser.parse_args()
+
+    calibration = Calibration.from_yaml(args.calibration)
+    results = run(calibration, QUICK_SWEEP if args.quick else SWEEP,
+                  args.shapes, args.repeats)
+    summary = summarize(results)
+    report = {"date": datetime.datetime.now().isoformat(),
+              "platform": platform.platform(),
+              "python": platform.python_version(),
+              "numpy": np.__version__, "opencv": cv2.__version__,
+              "quick": args.quick, "summary": summary, "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+
+    ratios = {}
+    if args.compare:
+        with open(args.compare) as f:
+            ratios = compare(results, json.load(f)["results"])
+    print("{:<14} {:>12} {:>10} {:>10}".format(
+        "stage", "time [ms]", "peak [MB]", "vs. prev"))
+    for stage, values in summary.items():
+        ratio = "{:.2f}x".format(ratios[stage]) if stage in ratios else ""
+        print("{:<14} {:>12.1f} {:>10.1f} {:>10}".format(
+            stage, values["time_ms"], values["peak_mb"], ratio))
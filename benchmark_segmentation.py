@@ -0,0 +1,64 @@
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from path_generator import BackgroundSegmenter
+from synthetic_scenes import make_scene
+
+
+def segment_mask_bg_legacy(img_background, img_object, bg_thresh):
+    # previous implementation of segment_mask_bg, modifies img_object
+    w, h = img_background.shape[0], img_background.shape[1]
+    brightness_mask = np.ones((w, h), np.uint8)
+
+    cv2.rectangle(brightness_mask, (200, 200), (h - 200, w - 200), 0, -1)
+    brightness_mask = brightness_mask.astype(bool)
+    bg_mean = np.mean(img_background[brightness_mask], 0)
+    obj_mean = np.mean(img_object[brightness_mask], 0)
+    beta = bg_mean - obj_mean
+
+    img_object[:, :, 0] = cv2.convertScaleAbs(
+        img_object[:, :, 0], alpha=1., beta=beta[0])
+    img_object[:, :, 1] = cv2.convertScaleAbs(
+        img_object[:, :, 1], alpha=1., beta=beta[1])
+    img_object[:, :, 2] = cv2.convertScaleAbs(
+        img_object[:, :, 2], alpha=1., beta=beta[2])
+
+    img_sub = cv2.absdiff(img_background, img_object)
+    img_sub = cv2.GaussianBlur(img_sub, (15, 15), 6)
+    img_sub = (
+        (np.any(img_sub[:, :] > bg_thresh, axis=2)) * 255).astype(np.uint8)
+    return img_sub
+
+
+def measure(function, img_bg, img_obj, repeats=10):
+    """ median runtime in ms and peak traced memory in MB of function """
+    function(img_bg, img_obj.copy(), 50)
+    times = []
+    for _ in range(repeats):
+        obj = img_obj.copy()
+        start = time.perf_counter()
+        function(img_bg, obj, 50)
+        times.append(time.perf_counter() - start)
+    obj = img_obj.copy()
+    tracemalloc.start()
+    function(img_bg, obj, 50)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return np.median(times) * 1000, peak / 1e6
+
+
+if __name__ == "__main__":
+    img_bg, img_obj, _ = make_scene("convex")
+    candidates = [("legacy", segment_mask_bg_legacy)]
+    for levels in (0, 1, 2):
+        segmenter = BackgroundSegmenter(levels)
+        candidates.append(("levels={}".format(levels), segmenter.segment))
+    reference = segment_mask_bg_legacy(img_bg, img_obj.copy(), 50)
+    print("{:<10} {:>10} {:>12} {:>14}".format(
+        "variant", "time [ms]", "peak [MB]", "mask diff [px]"))
+    for name, function in candidates:
+        runtime, peak = measure(function, img_bg, img_obj)
+        diff = np.count_nonzero(function(img_bg, img_obj.copy(), 50) != reference)
+        print("{:<10} {:>10.1f} {:>12.1f} {:>14}".format(name, runtime, peak, diff))
@@ -0,0 +1,151 @@
+import cv2
+import numpy as np
+import yaml
+
+
+class Calibration:
+    """camera calibration of the measurement plate (world Z=0)
+
+    Everything that only depends on the calibration (intrinsics, distortion,
+    plate homography and its inverse) is computed once on construction, the
+    mapping functions work on arbitrary Nx2 arrays.
+    """
+
+    def __init__(self, camera_matrix, dist_coeff, rotation_vector,
+                 translation_vector):
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeff = np.asarray(dist_coeff, dtype=np.float64)
+        self.rotation_vector = np.asarray(
+            rotation_vector, dtype=np.float64).reshape(3, 1)
+        self.translation_vector = np.asarray(
+            translation_vector, dtype=np.float64).reshape(3, 1)
+        # since Z in world coordinates is 0, remove third column from
+        # transformation matrix
+        rot, _ = cv2.Rodrigues(self.rotation_vector)
+        ext_mtx = np.concatenate((rot[:, :2], self.translation_vector), axis=1)
+        self.homography = np.matmul(self.camera_matrix, ext_mtx)
+        self.inv_homography = np.linalg.inv(self.homography)
+        self._grids = {}
+
+    @classmethod
+    def from_dict(cls, camera_dict):
+        return cls(camera_dict["camera_matrix"], camera_dict["dist_coeff"],
+                   camera_dict["rotation_vector"],
+                   camera_dict["translation_vector"])
+
+    @classmethod
+    def from_yaml(cls, filename="calibration_matrix.yaml"):
+        with open(filename, "r") as f:
+            return cls.from_dict(yaml.safe_load(f))
+
+    def to_dict(self):
+        return {"camera_matrix": self.camera_matrix.tolist(),
+                "dist_coeff": self.dist_coeff.tolist(),
+                "rotation_vector": self.rotation_vector.tolist(),
+                "translation_vector": self.translation_vector.tolist()}
+
+    def undistort(self, points):
+        """ removes the lens distortion from pixel coordinates
+
+        Arguments:
+            points {numpy array Nx2} -- u, v image coordinates
+
+        Returns:
+            numpy array Nx2 -- undistorted u, v image coordinates
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            # undistortPoints returns None for no points
+            return np.empty((0, 2))
+        undist = cv2.undistortPoints(points, self.camera_matrix,
+                                     self.dist_coeff, P=self.camera_matrix)
+        return undist.reshape(-1, 2)
+
+    def pixel2world(self, points, undistort=True):
+        """ take pixel coordinates and transform them into world coordinates
+            with Z=0
+
+        Arguments:
+            points {numpy array Nx2} -- u, v image coordinates
+
+        Keyword Arguments:
+            undistort {bool} -- undistort the pixel coordinates first (default: {True})
+
+        Returns:
+            numpy array Nx2 -- X, Y world coordinates
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if undistort:
+            points = self.undistort(points)
+        world = points @ self.inv_homography[:, :2].T + self.inv_homography[:, 2]
+        return world[:, :2] / world[:, 2, None]
+
+    def world2pixel(self, points, distort=True):
+        """ take world coordinates with Z=0 and project them into the image
+
+        Arguments:
+            points {numpy array Nx2} -- X, Y world coordinates
+
+        Keyword Arguments:
+            distort {bool} -- apply the lens distortion (default: {True})
+
+        Returns:
+            numpy array Nx2 -- u, v image coordinates
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if distort and len(points):
+            obj_points = np.concatenate(
+                (points, np.zeros((points.shape[0], 1))), axis=1)
+            pixels, _ = cv2.projectPoints(
+                obj_points, self.rotation_vector, self.translation_vector,
+                self.camera_matrix, self.dist_coeff)
+            return pixels.reshape(-1, 2)
+        pixels = points @ self.homography[:, :2].T + self.homography[:, 2]
+        return pixels[:, :2] / pixels[:, 2, None]
+
+    def metric_grid(self, image_size, resolution):
+        """ top-down grid of the plate area seen by the camera with square
+            cells of resolution mm, the remap tables are cached per size and
+            resolution
+
+        Arguments:
+            image_size {tuple} -- image size (u, v)
+            resolution {float} -- cell size in mm
+
+        Returns:
+            origin {numpy array [2,]} -- X, Y world coordinates of cell (0, 0)
+            map_u, map_v {numpy array, float32} -- image coordinates of every
+                                                   cell for cv2.remap
+        """
+        key = (tuple(image_size), float(resolution))
+        if key not in self._grids:
+            n_u, n_v = image_size
+            edge_u = np.linspace(0, n_u - 1, 64)
+            edge_v = np.linspace(0, n_v - 1, 64)
+            border = np.concatenate((
+                np.stack((edge_u, np.zeros(64)), axis=1),
+                np.stack((edge_u, np.full(64, n_v - 1)), axis=1),
+                np.stack((np.zeros(64), edge_v), axis=1),
+                np.stack((np.full(64, n_u - 1), edge_v), axis=1)))
+            world = self.pixel2world(border)
+            origin = world.min(axis=0)
+            n_x, n_y = np.ceil(
+                (world.max(axis=0) - origin) / resolution).astype(int) + 1
+            x = origin[0] + np.arange(n_x) * resolution
+            y = origin[1] + np.arange(n_y) * resolution
+            grid = np.stack(np.meshgrid(x, y), axis=-1).reshape(-1, 2)
+            pixels = self.world2pixel(grid).astype(np.float32)
+            map_u = pixels[:, 0].reshape(n_y, n_x)
+            map_v = pixels[:, 1].reshape(n_y, n_x)
+            self._grids[key] = (origin, map_u, map_v)
+        return self._grids[key]
+
+
+def as_calibration(camera):
+    """ returns camera unchanged if it already maps pixels to world
+        coordinates (e.g. a Calibration), otherwise builds a Calibration
+        from a camera dictionary as loaded from calibration_matrix.yaml
+    """
+    if hasattr(camera, "pixel2world"):
+        return camera
+    return Calibration.from_dict(camera)
@@ -1,5 +1,8 @@
 from harvesters.core import Harvester
 import cv2
+import time
+from background_model import BackgroundModel, average_frames
+from frame_ring import FrameRing, downscale
 
 # enzatex camera interface
 # requires
@@ -10,10 +13,11 @@ import cv2
 CTI = r"C:\Program Files\STEMMER IMAGING\Common Vision Blox\GenICam\bin\win64_x64\TLIs\GEVTL.cti"
 EXPOSURE_TIME = 49000
 GAIN = 10
+RING_SIZE = 4 # raw frames kept by the streaming acquisition
 
 
 class Camera:
-    def __init__(self):
+    def __init__(self, streaming=True):
         self._harvester = Harvester()
         self._harvester.add_file(CTI)
         self._harvester.update()
@@ -24,19 +28,73 @@ class Camera:
         #params.ExposureTime.value = EXPOSURE_TIME
         #params.Gain.value = GAIN
         self._acquirer.start()
-        
+        # with streaming, a background thread keeps draining the acquirer
+        # into a ring buffer of raw bayer frames
+        self._ring = FrameRing(self._fetch_raw, RING_SIZE) if streaming else None
+
+    def _fetch_raw(self, timeout=1.):
+        buffer = self._acquirer.try_fetch(timeout=timeout)
+        if buffer is None:
+            return None
+        with buffer:
+            component = buffer.payload.components[0]
+            # copy, the buffer is queued again on exit
+            return component.data.reshape(
+                component.height, component.width).copy()
+
     def capture(self):
-        '''retrieve next camera frame from the queue
+        '''retrieve the first camera frame taken after the call
         returns a HxWx3 numpy array (BGR image)
         '''
-        for i in range(4):
-            with self._acquirer.fetch() as buffer:
-                component = buffer.payload.components[0]
-                raw = component.data.reshape(component.height,component.width)
-                bgr = cv2.cvtColor(raw, cv2.COLOR_BayerRGGB2BGR)
-        return bgr
-    
+        if self._ring is not None:
+            _, raw = self._ring.wait_newer(time.monotonic())
+        else:
+            # skip the frames still waiting in the acquirer queue
+            for i in range(4):
+                raw = self._fetch_raw(timeout=5.)
+        return self._demosaic(raw)
+
+    def preview(self, levels=2):
+        '''newest frame reduced by 2**levels, without waiting for a new one
+        returns (timestamp, hxwx3 BGR image) or None before the first frame
+        '''
+        if self._ring is not None:
+            latest = self._ring.latest()
+            if latest is None:
+                return None
+            timestamp, raw = latest
+        else:
+            timestamp, raw = time.monotonic(), self._fetch_raw(timeout=5.)
+        return timestamp, downscale(raw, levels, bayer=True)
+
+    def _demosaic(self, raw):
+        return cv2.cvtColor(raw, cv2.COLOR_BayerRGGB2BGR)
+
+    def _raw_frames(self, count):
+        if self._ring is not None:
+            yield from self._ring.iter_new(count)
+            return
+        for i in range(3 + count):
+            raw = self._fetch_raw(timeout=5.)
+            # the first frames are still waiting in the acquirer queue
+            if i >= 3:
+                yield raw
+
+    def capture_average(self, count=8, method="mean"):
+        '''average count new raw frames before demosaicing
+        returns a HxWx3 numpy array (BGR image) with less sensor noise
+        '''
+        return self._demosaic(average_frames(self._raw_frames(count), method))
+
+    def capture_background(self, count=16):
+        '''capture count new frames of the empty plate
+        returns a BackgroundModel with the mean image and the sensor noise
+        '''
+        return BackgroundModel.from_frames(self._raw_frames(count), self._demosaic)
+
     def destroy(self):
+        if self._ring is not None:
+            self._ring.stop()
         self._acquirer.stop()
         self._acquirer.destroy()
         self._harvester.reset()     
@@ -1,59 +1,177 @@
 # from OpenCV Tutorial
 # https://docs.opencv.org/4.x/dc/dbb/tutorial_py_calibration.html
-import numpy as np
-import cv2 as cv
+import argparse
 import glob
 import csv
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import cv2 as cv
 import yaml
+from calibration import Calibration
 
+# corners are detected on a process pool and cached per image content in
+# CORNER_CACHE, so a rerun after adding images only processes the new ones
+# and dropping outliers re-solves from the cached corners
+CORNER_CACHE = 'corner_cache.npz'
+PATTERN_SIZE = (7, 7)
 
-if __name__ == '__main__':
-    # termination criteria
-    criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.001)
-    # prepare object points, like (0,0,0), (1,0,0), (2,0,0) ....,(6,5,0)
+
+def read_object_points(filename):
     # read in object points from file, first object point is on top left of
     # the image, second point right neighbor in top row, last point bottom
     # right
     objp = []
-    with open('1111_checkboard_points.csv', newline='') as csvfile:
+    with open(filename, newline='') as csvfile:
         spamreader = csv.reader(csvfile, delimiter=',')
         for row in spamreader:
             objp.append([float(row[0]), float(row[1]), float(row[2])])
-    objp = np.asarray(objp, dtype=np.float32)
-    # Arrays to store object points and image points from all the images.
-    objpoints = []  # 3d point in real world space
-    imgpoints = []  # 2d points in image plane.
-    images = glob.glob('EnzaTex/111*.bmp')
-    images = sorted(images)
-    for fname in images:
-        img = cv.imread(fname)
-        gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
-        # Find the chess board corners
-        ret, corners = cv.findChessboardCornersSB(gray, (7, 7))
-        # If found, add object points, image points (after refining them)
-        if ret == True:
-            objpoints.append(objp)
+    return np.asarray(objp, dtype=np.float32)
+
+
+def file_hash(filename):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def detect_corners(fname):
+    """ chessboard corners of an image file
+
+    Returns:
+        corners {numpy array Nx1x2, float32} -- empty if the board was not found
+        size {tuple} -- image size (width, height)
+    """
+    img = cv.imread(fname)
+    if img is None:
+        raise FileNotFoundError(fname)
+    gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+    ret, corners = cv.findChessboardCornersSB(gray, PATTERN_SIZE)
+    if not ret:
+        corners = np.zeros((0, 1, 2), dtype=np.float32)
+    return corners, gray.shape[::-1]
+
+
+def load_cache(filename=CORNER_CACHE):
+    """ {file hash: (corners, image size)} """
+    if not os.path.exists(filename):
+        return {}
+    with np.load(filename) as data:
+        return {key[2:]: (data[key], tuple(data['s_' + key[2:]]))
+                for key in data.files if key.startswith('c_')}
+
+
+def save_cache(cache, filename=CORNER_CACHE):
+    arrays = {}
+    for key, (corners, size) in cache.items():
+        arrays['c_' + key] = corners
+        arrays['s_' + key] = np.asarray(size)
+    np.savez(filename, **arrays)
+
+
+def find_corners(images, cache_file=CORNER_CACHE, workers=None):
+    """ corners and image size of every image, only images that are not in
+        the cache are processed (in parallel)
+
+    Returns:
+        list of (corners, size) -- in the order of images, corners are empty
+                                   where the board was not found
+    """
+    cache = load_cache(cache_file) if cache_file else {}
+    hashes = [file_hash(fname) for fname in images]
+    new = {h: fname for h, fname in zip(hashes, images) if h not in cache}
+    if new:
+        print('detecting corners in {} of {} images'.format(
+            len(new), len(images)))
+        with ProcessPoolExecutor(workers) as pool:
+            for h, result in zip(new, pool.map(detect_corners, new.values())):
+                cache[h] = result
+        if cache_file:
+            save_cache(cache, cache_file)
+    return [cache[h] for h in hashes]
+
+
+def calibrate(objp, views, image_size):
+    """ calibrates from the corners of several views
+
+    Returns:
+        rms error, camera matrix, distortion, rotation and translation vectors
+        and the RMS reprojection error of every view in px
+    """
+    objpoints = [objp] * len(views)
+    (ret, mtx, dist, rvecs, tvecs, _, _,
+     errors) = cv.calibrateCameraExtended(
+        objpoints, views, image_size, None, None)
+    return ret, mtx, dist, rvecs, tvecs, errors.ravel()
+
+
+def calibrate_without_outliers(objp, views, names, image_size, max_error=None,
+                               drop=()):
+    """ calibrates and removes the views in drop and, one at a time, the
+        worst view while its error is above max_error, then re-solves
+
+    The first view defines the pose of the plate (the extrinsics that are
+    saved), it is never removed.
+
+    Returns:
+        names of the used views and the result of calibrate
+    """
+    keep = [i for i, name in enumerate(names) if i == 0 or
+            (name not in drop and os.path.basename(name) not in drop)]
+    while True:
+        result = calibrate(objp, [views[i] for i in keep], image_size)
+        errors = result[-1]
+        worst = int(np.argmax(errors[1:])) + 1 if len(keep) > 1 else 0
+        if max_error is None or worst == 0 or errors[worst] <= max_error:
+            return [names[i] for i in keep], result
+        print('dropping {} ({:.3f} px)'.format(names[keep[worst]],
+                                                errors[worst]))
+        del keep[worst]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='calibrate the camera')
+    parser.add_argument('--images', default='EnzaTex/111*.bmp',
+                        help='glob pattern of the checkerboard images, the '
+                             'first image defines the plate pose')
+    parser.add_argument('--points', default='1111_checkboard_points.csv')
+    parser.add_argument('--output', default='calibration_matrix.yaml')
+    parser.add_argument('--cache', default=CORNER_CACHE,
+                        help='corner cache file, empty to disable')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-error', type=float, default=None,
+                        help='drop views with a larger reprojection error in px')
+    parser.add_argument('--drop', nargs='*', default=(),
+                        help='images to leave out')
+    args = parser.parse_args()
+
+    # prepare object points, like (0,0,0), (1,0,0), (2,0,0) ....,(6,5,0)
+    objp = read_object_points(args.points)
+    images = sorted(glob.glob(args.images))
+    detections = find_corners(images, args.cache, args.workers)
+    # Arrays to store image points of all the images with a board
+    names, imgpoints = [], []
+    for fname, (corners, size) in zip(images, detections):
+        if len(corners):
+            names.append(fname)
             imgpoints.append(corners)
+        else:
+            print('{}: no checkerboard found'.format(fname))
+    image_size = detections[0][1]
 
-    ret, mtx, dist, rvecs, tvecs = cv.calibrateCamera(
-        objpoints, imgpoints, gray.shape[::-1], None, None)
+    names, (ret, mtx, dist, rvecs, tvecs, errors) = calibrate_without_outliers(
+        objp, imgpoints, names, image_size, args.max_error, set(args.drop))
 
-    data = {'camera_matrix': np.asarray(mtx).tolist(),
-            'dist_coeff': np.asarray(dist).tolist(),
-            'rotation_vector': np.asarray(rvecs[0]).tolist(),
-            'translation_vector': np.asarray(tvecs[0]).tolist()}
+    data = Calibration(mtx, dist, rvecs[0], tvecs[0]).to_dict()
 
     # save calibration matrix to a file
-    with open("calibration_matrix.yaml", "w") as f:
+    with open(args.output, "w") as f:
         yaml.dump(data, f)
-    
-    rot, _ = cv.Rodrigues(rvecs[0])
-    
-    mean_error = 0
-    for i in range(len(objpoints)):
-        imgpoints2, _ = cv.projectPoints(objpoints[i], rvecs[i], tvecs[i], mtx, dist)
-        error = cv.norm(imgpoints[i], imgpoints2, cv.NORM_L2)/len(imgpoints2)
-        mean_error += error
-        print(error)
-    print( "total error: {}".format(mean_error/len(objpoints)) )
- 
\ No newline at end of file
+
+    for name, error in zip(names, errors):
+        print('{}: {:.3f} px'.format(name, error))
+    print("total error: {:.3f} px RMS over {} images".format(ret, len(names)))
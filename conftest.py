@@ -0,0 +1,23 @@
+import os
+
+import pytest
+import yaml
+from calibration import Calibration
+
+# fixtures shared by the tests, pytest.ini puts the repository root on
+# sys.path so the tests import its modules
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "calibration_matrix.yaml")
+
+
+@pytest.fixture(scope="session")
+def camera_dict():
+    """ calibration_matrix.yaml as loaded by the GUI """
+    with open(CALIBRATION_FILE) as f:
+        return yaml.safe_load(f)
+
+
+@pytest.fixture(scope="session")
+def calibration():
+    return Calibration.from_yaml(CALIBRATION_FILE)
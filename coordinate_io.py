@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+from calibration import as_calibration
+from coordinate_lut import CoordinateLUT
+from path_planner import path_length
+
+# binary waypoint files (.wpt)
+#
+#   magic "EZWP", uint16 version, uint8 dtype (0 float32 mm, 1 int32 fixed
+#   point), uint8 reserved, float64 scale (stored value = mm * scale),
+#   uint64 number of points (0 until the writer is closed), uint32 offset of
+#   the body, JSON metadata (sample, calibration hash, parameters) padded
+#   to the body offset, then N x (X, Y), everything little-endian
+#
+# The body starts at a multiple of 16 bytes and can be memory-mapped. A file
+# that is still being written, or whose writer was interrupted, is read up
+# to its last complete point.
+
+MAGIC = b"EZWP"
+VERSION = 1
+HEADER = struct.Struct("<4sHBxdQI")
+DTYPES = {"float32": (0, np.dtype("<f4")), "int32": (1, np.dtype("<i4"))}
+FIXED_SCALE = 100  # 1/100 mm like the automat wire format
+EXTENSION = ".wpt"
+
+
+def calibration_hash(camera):
+    """ short hash of the calibration values, to tell which calibration the
+        coordinates were computed with; a CoordinateLUT is identified by the
+        calibration attached to it, or by its table without one
+    """
+    camera = as_calibration(camera)
+    if isinstance(camera, CoordinateLUT):
+        if camera.calibration is None:
+            table = np.ascontiguousarray(camera.lut)
+            return hashlib.sha1(table.data).hexdigest()[:16]
+        camera = as_calibration(camera.calibration)
+    data = json.dumps(camera.to_dict(), sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+
+class CoordinateWriter:
+    """writes waypoints to a .wpt file, points can be appended in any number
+    of chunks while the path is generated
+
+        with CoordinateWriter("2001.wpt", sample="2001", params=params) as f:
+            for chunk in generator.iter_path(img_obj, img_bg, **params):
+                f.append(chunk)
+
+    Keyword Arguments:
+        sample {str} -- sample name (default: {None})
+        calibration {Calibration or dict} -- stored as calibration_hash (default: {None})
+        params {dict} -- planning parameters, must be JSON serializable (default: {None})
+        dtype {str} -- "float32" or "int32" fixed point (default: {"float32"})
+        scale {float} -- int32 values per mm (default: {FIXED_SCALE})
+    """
+
+    def __init__(self, filename, sample=None, calibration=None, params=None,
+                 dtype="float32", scale=FIXED_SCALE):
+        if dtype not in DTYPES:
+            raise ValueError("unknown dtype {}".format(dtype))
+        self.filename = filename
+        self._code, self._dtype = DTYPES[dtype]
+        self.scale = float(scale) if self._code == 1 else 1.
+        meta = {"sample": sample, "params": params or {},
+                "calibration": (None if calibration is None
+                                else calibration_hash(calibration)),
+                "created": datetime.now().isoformat(" ")}
+        text = json.dumps(meta).encode()
+        self._offset = -(-(HEADER.size + len(text)) // 16) * 16
+        self.n_points = 0
+        self._file = open(filename, "wb")
+        self._write_header()
+        self._file.write(text.ljust(self._offset - HEADER.size))
+
+    def _write_header(self):
+        self._file.write(HEADER.pack(MAGIC, VERSION, self._code, self.scale,
+                                     self.n_points, self._offset))
+
+    def append(self, coords):
+        """ appends Nx2 world coordinates in mm """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if self._code == 1:
+            values = np.rint(coords * self.scale).astype(self._dtype)
+        else:
+            values = coords.astype(self._dtype)
+        self._file.write(values.tobytes())
+        self.n_points += len(coords)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """ writes the number of points, which marks the file complete """
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_coordinates(filename, coords, **kwargs):
+    """ writes all coordinates at once, see CoordinateWriter for kwargs """
+    with CoordinateWriter(filename, **kwargs) as f:
+        f.append(coords)
+
+
+class CoordinateFile:
+    """reads a .wpt file, the body is memory-mapped
+
+    Attributes:
+        sample, calibration, params, created -- metadata of the writer
+        complete {bool} -- False while the file is still being written
+        values {numpy array Nx2} -- stored values (float32 mm or int32 fixed point)
+    """
+
+    def __init__(self, filename, mmap=True):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size or header[:4] != MAGIC:
+                raise ValueError("{} is not a waypoint file".format(filename))
+            (_, self.version, code, self.scale, n_points,
+             offset) = HEADER.unpack(header)
+            if self.version > VERSION:
+                raise ValueError("{} has the unsupported version {}".format(
+                    filename, self.version))
+            meta = json.loads(f.read(offset - HEADER.size).rstrip(b" ").decode())
+        self.sample = meta.get("sample")
+        self.calibration = meta.get("calibration")
+        self.params = meta.get("params", {})
+        self.created = meta.get("created")
+        dtype = {c: d for c, d in DTYPES.values()}[code]
+        available = (os.path.getsize(filename) - offset) // (2 * dtype.itemsize)
+        self.complete = n_points == available
+        if mmap and available:
+            self.values = np.memmap(filename, dtype=dtype, mode="r",
+                                    offset=offset, shape=(available, 2))
+        else:
+            self.values = np.fromfile(filename, dtype=dtype,
+                                      count=2 * available,
+                                      offset=offset).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def coords(self):
+        """ world coordinates in mm (float64 copy) """
+        return np.asarray(self.values, dtype=np.float64) / self.scale
+
+
+def read_coordinates(filename):
+    """ world coordinates of a .wpt file or a text file of np.savetxt """
+    if filename.endswith(EXTENSION):
+        return CoordinateFile(filename).coords
+    return np.loadtxt(filename, ndmin=2)
+
+
+def diff_coordinates(a, b, chunk=1024):
+    """ compares two waypoint files, e.g. of two parameter runs
+
+    Returns:
+        dict -- "params" with the differing parameters as (a, b) tuples,
+                "waypoints" and "length" as (a, b) tuples and "distance", the
+                largest distance in mm from a waypoint of one file to the
+                closest waypoint of the other
+    """
+    a, b = CoordinateFile(a), CoordinateFile(b)
+    ca, cb = a.coords, b.coords
+    keys = set(a.params) | set(b.params)
+    params = {k: (a.params.get(k), b.params.get(k)) for k in sorted(keys)
+              if a.params.get(k) != b.params.get(k)}
+    distance = 0.
+    if len(ca) and len(cb):
+        for p, q in ((ca, cb), (cb, ca)):
+            for i in range(0, len(p), chunk):
+                d = np.linalg.norm(p[i:i + chunk, None] - q[None], axis=2)
+                distance = max(distance, float(d.min(axis=1).max()))
+    return {"params": params, "waypoints": (len(ca), len(cb)),
+            "length": (path_length(ca), path_length(cb)),
+            "distance": distance}
+
+
+def export_path(generator, filename, img_obj, img_bg, sample=None,
+                dtype="float32", **params):
+    """ plans a path with PathGenerator.iter_path and streams the waypoints
+        into a .wpt file as they are converted
+
+    Returns:
+        int -- number of waypoints
+    """
+    with CoordinateWriter(filename, sample, generator.calibration, params,
+                          dtype) as f:
+        for coords in generator.iter_path(img_obj, img_bg, **params):
+            f.append(coords)
+    return f.n_points
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="inspect waypoint files")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--diff", action="store_true",
+                        help="compare the first file with the others")
+    args = parser.parse_args()
+
+    if args.diff:
+        for other in args.files[1:]:
+            d = diff_coordinates(args.files[0], other)
+            print("{}: {} -> {} waypoints, {:.0f} -> {:.0f} mm, largest "
+                  "distance {:.2f} mm, parameters {}".format(
+                      other, *d["waypoints"], *d["length"], d["distance"],
+                      d["params"]))
+    else:
+        for name in args.files:
+            f = CoordinateFile(name)
+            print("{}: sample {}, {} waypoints{}, calibration {}, {}".format(
+                name, f.sample, len(f), "" if f.complete else " (incomplete)",
+                f.calibration, f.params))
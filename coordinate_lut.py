@@ -0,0 +1,114 @@
+import numpy as np
+
+# size of the camera image (u, v)
+IMAGE_SIZE = (2448, 2048)
+
+
+def build_lut(calibration, filename="coordinate_lut.npy", size=IMAGE_SIZE,
+              chunk=64):
+    """ writes a lookup table with the world coordinates of every pixel,
+        the table is computed in chunks of image columns and streamed into a
+        memory-mapped .npy file so only one chunk is held in memory
+
+    Arguments:
+        calibration {Calibration} -- camera calibration
+
+    Keyword Arguments:
+        filename {str} -- output .npy file (default: {"coordinate_lut.npy"})
+        size {tuple} -- image size (u, v) (default: {IMAGE_SIZE})
+        chunk {int} -- number of u values computed at once (default: {64})
+    """
+    n_u, n_v = size
+    lut = np.lib.format.open_memmap(
+        filename, mode="w+", dtype=np.float32, shape=(n_u, n_v, 2))
+    v = np.arange(n_v, dtype=np.float64)
+    for u_start in range(0, n_u, chunk):
+        u = np.arange(u_start, min(u_start + chunk, n_u), dtype=np.float64)
+        grid = np.stack(np.meshgrid(u, v, indexing="ij"), axis=-1)
+        world = calibration.pixel2world(grid.reshape(-1, 2))
+        lut[u_start:u_start + len(u)] = world.reshape(len(u), n_v, 2)
+    lut.flush()
+    del lut
+
+
+class CoordinateLUT:
+    """memory-mapped pixel to world lookup table written by build_lut
+
+    Can be passed to path_generation in place of the calibration. Points
+    outside of the table are mapped with the calibration if one is given,
+    otherwise they are extrapolated linearly from the border of the table.
+    Planning on the metric grid (resolution) needs the calibration.
+    """
+
+    def __init__(self, filename="coordinate_lut.npy", calibration=None):
+        self.lut = np.load(filename, mmap_mode="r")
+        self.calibration = calibration
+
+    def lookup(self, points):
+        """ world coordinates of the nearest table entry
+
+        Arguments:
+            points {numpy array Nx2} -- u, v image coordinates
+
+        Returns:
+            numpy array Nx2 -- X, Y world coordinates
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        u = np.clip(np.rint(points[:, 0]), 0, self.lut.shape[0] - 1).astype(int)
+        v = np.clip(np.rint(points[:, 1]), 0, self.lut.shape[1] - 1).astype(int)
+        return self.lut[u, v].astype(np.float64)
+
+    def interpolate(self, points):
+        """ bilinear interpolated world coordinates, points outside of the
+            table are extrapolated from its border cells
+
+        Arguments:
+            points {numpy array Nx2} -- u, v image coordinates
+
+        Returns:
+            numpy array Nx2 -- X, Y world coordinates
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        n_u, n_v = self.lut.shape[:2]
+        u, v = points[:, 0], points[:, 1]
+        u0 = np.clip(np.floor(u), 0, n_u - 2).astype(int)
+        v0 = np.clip(np.floor(v), 0, n_v - 2).astype(int)
+        fu, fv = (u - u0)[:, None], (v - v0)[:, None]
+        top = (1 - fv) * self.lut[u0, v0] + fv * self.lut[u0, v0 + 1]
+        bottom = (1 - fv) * self.lut[u0 + 1, v0] + fv * self.lut[u0 + 1, v0 + 1]
+        return (1 - fu) * top + fu * bottom
+
+    def pixel2world(self, points, undistort=True):
+        """ take pixel coordinates and transform them into world coordinates
+            with Z=0, same interface as Calibration.pixel2world
+
+        Arguments:
+            points {numpy array Nx2} -- u, v image coordinates
+
+        Returns:
+            numpy array Nx2 -- X, Y world coordinates
+        """
+        if not undistort:
+            raise ValueError("the lookup table only holds undistorted coordinates")
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        world = self.interpolate(points)
+        if self.calibration is not None:
+            outside = ((points < 0) | (points > np.asarray(self.lut.shape[:2]) - 1)).any(axis=1)
+            if outside.any():
+                world[outside] = self.calibration.pixel2world(points[outside])
+        return world
+
+    def world2pixel(self, points, distort=True):
+        """ Calibration.world2pixel of the attached calibration """
+        return self._require_calibration().world2pixel(points, distort)
+
+    def metric_grid(self, image_size, resolution):
+        """ Calibration.metric_grid of the attached calibration """
+        return self._require_calibration().metric_grid(image_size, resolution)
+
+    def _require_calibration(self):
+        if self.calibration is None:
+            raise ValueError("the lookup table only maps pixels to world "
+                             "coordinates, pass a calibration for the "
+                             "metric grid")
+        return self.calibration
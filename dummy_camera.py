@@ -1,20 +1,72 @@
 import cv2
+import time
+from background_model import BackgroundModel, average_frames
+from frame_ring import FrameRing
+
+RING_SIZE = 4 # webcam frames kept by the streaming acquisition
 
 class Camera:
-    def __init__(self):
+    def __init__(self, streaming=True):
         self.vid = cv2.VideoCapture(0)
-        
+        self._ring = FrameRing(self._read, RING_SIZE) if streaming else None
+
+    def _read(self):
+        ret, bgr = self.vid.read()
+        if not ret:
+            time.sleep(0.01)
+            return None
+        return bgr
+
     def capture(self):
-        '''retrieve next camera frame from the queue
+        '''retrieve the first camera frame taken after the call
         returns a HxWx3 numpy array (BGR image)
         '''
-        for i in range(5):
+        if self._ring is not None:
+            _, bgr = self._ring.wait_newer(time.monotonic())
+        else:
+            for i in range(5):
+                ret, bgr = self.vid.read()
+        return self._resize(bgr)
+
+    def _resize(self, bgr, levels=0):
+        return cv2.resize(bgr, (2448 >> levels, 2048 >> levels))
+
+    def preview(self, levels=2):
+        '''newest webcam frame in the camera size reduced by 2**levels
+        returns (timestamp, hxwx3 BGR image) or None before the first frame
+        '''
+        if self._ring is not None:
+            latest = self._ring.latest()
+            if latest is None:
+                return None
+            timestamp, bgr = latest
+        else:
+            timestamp, (ret, bgr) = time.monotonic(), self.vid.read()
+        return timestamp, self._resize(bgr, levels)
+
+    def _frames(self, count):
+        if self._ring is not None:
+            yield from self._ring.iter_new(count)
+            return
+        for i in range(count):
             ret, bgr = self.vid.read()
-        bgr = cv2.resize(bgr, (2448, 2048))
-        
-        return bgr
-    
+            yield bgr
+
+    def capture_average(self, count=8, method="mean"):
+        '''average count new webcam frames
+        returns a HxWx3 numpy array (BGR image)
+        '''
+        return self._resize(average_frames(self._frames(count), method))
+
+    def capture_background(self, count=16):
+        '''capture count new frames of the empty plate
+        returns a BackgroundModel with the mean image and the sensor noise
+        '''
+        return BackgroundModel.from_frames(self._frames(count), self._resize)
+
     def destroy(self):
+        if self._ring is not None:
+            self._ring.stop()
         self.vid.release()
     
     
@@ -0,0 +1,183 @@
+import os
+import queue
+import threading
+import zlib
+
+import cv2
+import numpy as np
+from coordinate_io import EXTENSION as WAYPOINT_EXTENSION
+from coordinate_io import write_coordinates as write_waypoints
+
+# image formats of FileWriter: extension and the cv2.imencode parameters for
+# a compression level, "npy" is written raw with np.save
+FORMATS = {
+    # without a level the run length strategy is used, which is about twice
+    # as fast as zlib level 1 at a similar size for camera images
+    "png": (".png", lambda level: [cv2.IMWRITE_PNG_STRATEGY,
+                                   cv2.IMWRITE_PNG_STRATEGY_RLE]
+            if level is None else [cv2.IMWRITE_PNG_COMPRESSION, level]),
+    # a quality above 100 selects lossless WebP
+    "webp": (".webp", lambda level: [cv2.IMWRITE_WEBP_QUALITY, 101]),
+    "npy": (".npy", None),
+}
+
+
+def load_image(filename):
+    """ reads an image written by FileWriter, None if it is not readable """
+    if filename.endswith(".npy"):
+        try:
+            return np.load(filename)
+        except (OSError, ValueError):
+            return None
+    return cv2.imread(filename)
+
+
+def _replace(filename, write):
+    # write to a temporary file next to the target and rename it, so a
+    # reader never sees a partially written file
+    directory, name = os.path.split(filename)
+    tmp = os.path.join(directory, "." + name + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class FileWriter:
+    """writes images and coordinates on a background thread
+
+    Every file is written to a temporary name and renamed when it is
+    complete. The arrays are not copied, they must not be modified after
+    they were passed in. At most max_pending writes are queued, further
+    writes block until the thread catches up. flush() waits until
+    everything queued is on disk, close() flushes and stops the thread.
+    A write that fails is printed and its filename is kept in failed until
+    pop_failed() is called.
+
+    Images written with unchanged=True are compared to the previous such
+    image, an identical image is hard linked to the file written before
+    instead of being encoded again (copied where links are unsupported).
+    """
+
+    def __init__(self, image_format="png", level=None, max_pending=8):
+        if image_format not in FORMATS:
+            raise ValueError("unknown image format {}".format(image_format))
+        self.extension, params = FORMATS[image_format]
+        self._params = params(level) if params is not None else None
+        self._queue = queue.Queue(max_pending)
+        self._last = None
+        self.failed = []
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def image_filename(self, filename):
+        """ filename with the extension of the image format """
+        return os.path.splitext(filename)[0] + self.extension
+
+    def write_image(self, filename, img, unchanged=False):
+        """ queues img, returns the filename with the format's extension """
+        filename = self.image_filename(filename)
+        self._queue.put((self._write_image, (filename, img, unchanged)))
+        return filename
+
+    def write_coordinates(self, filename, coords, fmt="%10.5f", **header):
+        """ queues a text file, or a binary waypoint file for a .wpt
+            filename with the header arguments of coordinate_io.CoordinateWriter
+        """
+        self._queue.put((self._write_coordinates,
+                         (filename, coords, fmt, header)))
+        return filename
+
+    def write_file(self, filename, write):
+        """ queues write(f) on a binary file that replaces filename when
+            write returns, e.g. write_file("model.npz", model.save)
+        """
+        self._queue.put((_replace, (filename, write)))
+        return filename
+
+    def flush(self):
+        self._queue.join()
+
+    def pop_failed(self):
+        """ filenames that could not be written since the last call, call
+            after flush() to include everything queued before
+        """
+        failed, self.failed = self.failed, []
+        return failed
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                self._queue.task_done()
+                return
+            write, args = task
+            try:
+                write(*args)
+            except Exception as e:
+                self.failed.append(args[0])
+                print("Writing {} failed: {}".format(args[0], e))
+            finally:
+                self._queue.task_done()
+
+    def _write_image(self, filename, img, unchanged):
+        if unchanged:
+            key = (img.shape, zlib.crc32(np.ascontiguousarray(img)))
+            if (self._last is not None and self._last[0] == key
+                    and os.path.exists(self._last[1])):
+                self._link(self._last[1], filename)
+                return
+        if self._params is None:
+            _replace(filename, lambda f: np.save(f, img))
+        else:
+            ok, data = cv2.imencode(self.extension, img, self._params)
+            if not ok:
+                raise ValueError("encoding as {} failed".format(self.extension))
+            _replace(filename, lambda f: f.write(data))
+        if unchanged:
+            self._last = (key, filename)
+
+    def _link(self, source, filename):
+        if os.path.abspath(source) == os.path.abspath(filename):
+            return
+        directory, name = os.path.split(filename)
+        tmp = os.path.join(directory, "." + name + ".tmp")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(source, tmp)
+        except OSError:
+            with open(source, "rb") as f:
+                data = f.read()
+            _replace(filename, lambda out: out.write(data))
+            return
+        os.replace(tmp, filename)
+
+    def _write_coordinates(self, filename, coords, fmt, header):
+        if not filename.endswith(WAYPOINT_EXTENSION):
+            _replace(filename, lambda f: np.savetxt(f, coords, fmt=fmt))
+            return
+        directory, name = os.path.split(filename)
+        tmp = os.path.join(directory, "." + name + ".tmp")
+        try:
+            write_waypoints(tmp, coords, **header)
+            os.replace(tmp, filename)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
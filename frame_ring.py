@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FrameRing:
+    """continuously drains a frame source on a background thread into a
+    small ring buffer, so a capture never waits for stale buffered frames
+
+    grab is called in a loop and returns the next raw frame or None if no
+    frame arrived in time. Frames are stored together with the time they
+    arrived (time.monotonic).
+    """
+
+    def __init__(self, grab, size=4):
+        self._grab = grab
+        self._frames = deque(maxlen=size)
+        self._condition = threading.Condition()
+        self._running = True
+        self._error = None
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while self._running:
+            try:
+                frame = self._grab()
+            except Exception as e:
+                with self._condition:
+                    self._error = e
+                    self._condition.notify_all()
+                return
+            if frame is None:
+                continue
+            with self._condition:
+                self._frames.append((time.monotonic(), frame))
+                self._condition.notify_all()
+
+    def latest(self):
+        """ returns (timestamp, frame) of the newest frame or None """
+        with self._condition:
+            return self._frames[-1] if self._frames else None
+
+    def wait_newer(self, after, timeout=5.):
+        """ waits for the freshest frame that arrived after the given time
+
+        Arguments:
+            after {float} -- time.monotonic() timestamp
+
+        Keyword Arguments:
+            timeout {float} -- seconds to wait for a frame (default: {5.})
+
+        Returns:
+            (float, numpy array) -- timestamp and raw frame
+        """
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: self._error is not None
+                or (self._frames and self._frames[-1][0] > after), timeout)
+            if self._error is not None:
+                raise RuntimeError("frame acquisition stopped") from self._error
+            if not ready:
+                raise TimeoutError("no new frame within {} s".format(timeout))
+            return self._frames[-1]
+
+    def iter_new(self, count, after=None, timeout=5.):
+        """ yields count distinct frames that arrived after the given time
+
+        Keyword Arguments:
+            after {float} -- time.monotonic() timestamp, now if None (default: {None})
+            timeout {float} -- seconds to wait for every frame (default: {5.})
+        """
+        last = time.monotonic() if after is None else after
+        for _ in range(count):
+            last, frame = self.wait_newer(last, timeout)
+            yield frame
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+
+
+def downscale(frame, levels, bayer=False):
+    """ reduces a frame by 2**levels for previews
+
+    Arguments:
+        frame {numpy array} -- HxWx3 BGR image or HxW raw RGGB bayer frame
+        levels {int} -- number of halvings
+
+    Keyword Arguments:
+        bayer {bool} -- frame is raw, every 2x2 bayer block becomes one BGR
+                        pixel, which is also the first halving (default: {False})
+
+    Returns:
+        numpy array, uint8 -- BGR image
+    """
+    if bayer:
+        green = (frame[0::2, 1::2].astype(np.uint16) + frame[1::2, 0::2]) >> 1
+        frame = np.dstack((frame[1::2, 1::2], green.astype(np.uint8),
+                           frame[0::2, 0::2]))
+        levels -= 1
+    for _ in range(levels):
+        frame = cv2.pyrDown(frame)
+    return frame
@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+# frames of the GUI session and their encoded previews
+
+FRAMES = ("background", "textile", "mask", "path")
+IMAGE_SHAPE = (2048, 2448, 3)
+
+
+class FrameStore:
+    """keeps the frames of the GUI session in uint8 buffers that are
+    allocated once and reused for every sample
+
+    set() copies a frame into its buffer, get() returns the buffer or None
+    while it holds no frame. The downscaled preview of every frame is
+    encoded once and kept until the frame is set again, so switching
+    between the views does not resize or encode anything.
+
+    The buffers are overwritten by the next set(), whoever still uses a
+    frame (e.g. a pending file write) has to be finished before.
+    """
+
+    def __init__(self, preview_size, shape=IMAGE_SHAPE, frames=FRAMES):
+        self.preview_size = preview_size
+        self._buffers = {name: np.zeros(shape[:2] if name == "mask" else shape,
+                                        dtype=np.uint8) for name in frames}
+        self._valid = dict.fromkeys(frames, False)
+        self._previews = {}
+        self._preview = np.zeros((preview_size[1], preview_size[0], 3),
+                                 dtype=np.uint8)
+        self._empty = self._encode(self._preview)
+
+    def set(self, name, frame):
+        """ copies frame into the buffer of name and returns the buffer """
+        buffer = self._buffers[name]
+        if buffer.shape != frame.shape:
+            buffer = self._buffers[name] = np.empty(frame.shape, np.uint8)
+        np.copyto(buffer, frame, casting="unsafe")
+        self._valid[name] = True
+        self._previews.pop(name, None)
+        return buffer
+
+    def get(self, name):
+        return self._buffers[name] if self._valid[name] else None
+
+    def has(self, name):
+        return self._valid[name]
+
+    def clear(self, name):
+        """ marks the frame as empty, the buffer is kept for the next one """
+        self._valid[name] = False
+        self._previews.pop(name, None)
+
+    def preview(self, name):
+        """ encoded preview image of the frame (black while it is empty) """
+        if not self._valid[name]:
+            return self._empty
+        if name not in self._previews:
+            frame = self._buffers[name]
+            if frame.ndim == 2:
+                small = cv2.resize(frame, self.preview_size,
+                                   interpolation=cv2.INTER_AREA)
+                cv2.cvtColor(small, cv2.COLOR_GRAY2BGR, dst=self._preview)
+            else:
+                cv2.resize(frame, self.preview_size, dst=self._preview,
+                           interpolation=cv2.INTER_AREA)
+            self._previews[name] = self._encode(self._preview)
+        return self._previews[name]
+
+    @staticmethod
+    def _encode(img):
+        return cv2.imencode(".ppm", img)[1].tobytes()
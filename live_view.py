@@ -0,0 +1,123 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+from calibration import as_calibration
+from frame_ring import downscale
+from path_generator import (BackgroundSegmenter, margin_mask, pixel2world,
+                            pixel_size, plan_rows)
+from path_planner import path_length
+
+
+class LiveView:
+    """segments the newest camera frame against the background and plans an
+    estimated path on a reduced resolution, on a background thread at a
+    steady rate
+
+    Every tick takes the newest frame of camera.preview(levels), frames that
+    arrive while a frame is processed are dropped and a tick that is missed
+    is not made up. After a frame is processed, callback() is called from
+    the thread unless the previous result was not collected with result()
+    yet, so the GUI event queue never fills up with overlays.
+    """
+
+    def __init__(self, camera, calibration, callback, levels=2, fps=10.,
+                 preview_size=None):
+        self._camera = camera
+        self.calibration = as_calibration(calibration)
+        self._callback = callback
+        self.levels = levels
+        self.period = 1. / fps
+        self.preview_size = preview_size
+        self._segmenter = BackgroundSegmenter(prescaled=levels)
+        self._lock = threading.Lock()
+        self._background = None
+        self._params = (50, 20, 10)
+        self._result = None
+        self._notified = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def set_background(self, img_bg):
+        """ full resolution background image, reduced once """
+        background = downscale(img_bg, self.levels)
+        with self._lock:
+            self._background = background
+
+    def set_params(self, bg_thresh, spacing, dilation):
+        with self._lock:
+            self._params = (bg_thresh, spacing, dilation)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._work, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def result(self):
+        """ newest (overlay image, waypoints, path length in mm), None
+            before the first frame, the exception if the camera failed
+        """
+        with self._lock:
+            self._notified = False
+            return self._result
+
+    def process(self, frame, background, bg_thresh, spacing, dilation):
+        """ mask and estimated path of a reduced frame
+
+        Returns:
+            numpy array hxwx3, uint8 -- frame with the mask and path drawn
+            int -- number of waypoints
+            float -- path length in mm
+        """
+        scale = 2 ** self.levels
+        mask = self._segmenter.segment(background, frame, bg_thresh)
+        full_shape = (frame.shape[0] * scale, frame.shape[1] * scale)
+        pixmm = pixel_size(self.calibration, full_shape) * scale
+        region = margin_mask(mask, dilation / pixmm)
+        points = np.asarray(plan_rows(region, pixmm, spacing),
+                            dtype=np.float64).reshape(-1, 2)
+        length = path_length(pixel2world(points * scale, self.calibration))
+
+        overlay = frame.copy()
+        overlay[mask > 0] = (0, 255, 0)
+        overlay = cv2.addWeighted(frame, 0.6, overlay, 0.4, 0)
+        if len(points):
+            cv2.polylines(overlay, [np.rint(points).astype(np.int32)], False,
+                          (255, 255, 255), 1)
+        if self.preview_size is not None:
+            overlay = cv2.resize(overlay, self.preview_size)
+        return overlay, len(points), length
+
+    def _work(self):
+        next_time, last = time.monotonic(), None
+        while not self._stop.wait(max(next_time - time.monotonic(), 0.)):
+            next_time = max(next_time + self.period, time.monotonic())
+            with self._lock:
+                background, params = self._background, self._params
+            try:
+                latest = self._camera.preview(self.levels)
+                if background is None or latest is None or latest[0] == last:
+                    continue
+                last, frame = latest
+                result = self.process(frame, background, *params)
+            except Exception as e:
+                result = e
+            with self._lock:
+                self._result = result
+                notify, self._notified = not self._notified, True
+            if notify:
+                self._callback()
+            if isinstance(result, Exception):
+                return
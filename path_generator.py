@@ -1,13 +1,26 @@
+import contextlib
+import threading
+import time
+import warnings
+import zlib
+from collections import OrderedDict
+
 import cv2
 import numpy as np
+from calibration import as_calibration
+from path_planner import (PlanningCancelled, decompose_cells, order_cells,
+                          path_length, rotate_region, row_angle,
+                          scanline_intervals, simplify_path)
 
 
 def path_generation(camera_dict, img_obj, img_bg,
-                    bg_thresh=50, spacing=20, dilation=10):
+                    bg_thresh=50, spacing=20, dilation=10,
+                    planner="boustrophedon", resolution=None, align=False,
+                    tolerance=None):
     """generates path coordinates and visualization image
 
     Arguments:
-        camera_dict {dict} -- camera parameters (matrix, dist coeff, tvecs, rvecs)
+        camera_dict {dict or Calibration} -- camera parameters (matrix, dist coeff, tvecs, rvecs)
         img_obj {_type_} -- image with an object on the plate
         img_bg {_type_} -- image of only the background
 
@@ -15,15 +28,259 @@ def path_generation(camera_dict, img_obj, img_bg,
         bg_thresh {int} -- threshold for object masking (default: {50})
         spacing {int} -- space in mm (roughly) between two path rows (default: {20})
         dilation {int} -- space in mm (roughly) that is added at the edges of the maks (default: {10})
+        planner {str} -- "boustrophedon" plans every part of concave or multi
+                         part textiles separately, "meander" only connects the
+                         first and last edge of every row (default: {"boustrophedon"})
+        resolution {float} -- if set, the mask is warped once into a top-down
+                              grid with cells of resolution mm and the path is
+                              planned there with exact mm spacing, needs a
+                              Calibration; a spacing that is not a multiple
+                              of resolution is rounded down to one with a
+                              warning (default: {None})
+        align {bool} -- turn the rows to the direction that needs the fewest
+                        rows (default: {False})
+        tolerance {float} -- merge waypoints that deviate less than tolerance
+                             mm from a straight path (default: {None})
 
     Returns:
         path_img  {numpy array HxWx3, uint8} -- visualization image with path drawn
         world_coords {numpy array Nx2, float64} -- coordinates of the path points
     """
-    img = img_obj
-    img_mask = segment_mask_bg(img_bg, img_obj, bg_thresh)
+    generator = PathGenerator(camera_dict, cache_size=1)
+    return generator.run(img_obj, img_bg, bg_thresh, spacing, dilation,
+                         planner, resolution, align=align,
+                         tolerance=tolerance)
+
+
+class StageTimer:
+    """measures the summed duration of named stages
+
+        timer = StageTimer(enabled=True)
+        with timer.stage("segmentation"):
+            ...
+        timer.durations  # {"segmentation": seconds}
+
+    A disabled timer hands out one shared no-op context manager, so the
+    instrumentation only costs a method call.
+    """
+
+    _disabled = contextlib.nullcontext()
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.durations = {}
+
+    def stage(self, name):
+        if not self.enabled:
+            return self._disabled
+        return _Stage(self.durations, name)
+
+    def reset(self):
+        self.durations = {}
+
+
+class _Stage:
+    __slots__ = ("durations", "name", "start")
+
+    def __init__(self, durations, name):
+        self.durations = durations
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.durations[self.name] = (self.durations.get(self.name, 0.)
+                                     + time.perf_counter() - self.start)
+
+
+NO_TIMER = StageTimer()
+
+
+def image_key(img):
+    """ identifies an image by its shape and a checksum of its content """
+    return img.shape, zlib.crc32(np.ascontiguousarray(img))
+
+
+class PathGenerator:
+    """path_generation split into stages whose results are kept in small LRU
+    caches, so only the stages after a changed parameter are recomputed:
+
+        segmentation <- images, bg_thresh
+        margin       <- dilation, resolution
+        scanlines    <- spacing, planner, align
+
+    With levels > 0 all stages work on a mask that is 2**levels times smaller
+    than the camera image, which is used for a fast preview.
+    Returned masks are shared with the cache and must not be modified.
+    """
+
+    def __init__(self, camera_dict, cache_size=4):
+        self.calibration = as_calibration(camera_dict)
+        self.cache_size = cache_size
+        self._caches = {}
+
+    def clear(self):
+        self._caches.clear()
+
+    def _cached(self, stage, key, function, *args):
+        cache = self._caches.setdefault(stage, OrderedDict())
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        value = function(*args)
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def _margin(self, img_mask, shape, dilation, resolution):
+        _, thresh = cv2.threshold(img_mask, 127, 255, cv2.THRESH_BINARY)
+        scale = shape[0] / thresh.shape[0]
+        if resolution is None:
+            pixmm = pixel_size(self.calibration, shape) * scale
+        else:
+            # plan on the top-down metric grid, one cell is resolution mm wide
+            _, map_u, map_v = self.calibration.metric_grid(
+                (shape[1], shape[0]), resolution)
+            if scale != 1:
+                map_u, map_v = map_u / scale, map_v / scale
+            thresh = cv2.remap(thresh, map_u, map_v, cv2.INTER_NEAREST)
+            pixmm = resolution
+        return margin_mask(thresh, dilation / pixmm), pixmm
+
+    def run(self, img_obj, img_bg, bg_thresh=50, spacing=20, dilation=10,
+            planner="boustrophedon", resolution=None, levels=0,
+            cancelled=None, timer=NO_TIMER, align=False, tolerance=None,
+            stats=None):
+        """generates path coordinates and visualization image, see
+        path_generation for the arguments
+
+        Keyword Arguments:
+            levels {int} -- pyramid levels below the camera resolution the
+                            path is planned on (default: {0})
+            cancelled {callable} -- checked between the stages, raises
+                                    PlanningCancelled if it returns True (default: {None})
+            timer {StageTimer} -- records the duration of the stages (default: {NO_TIMER})
+            stats {dict} -- filled with the number of waypoints and the path
+                            length in mm without alignment and merging
+                            ("waypoints_before", "length_before") and of the
+                            returned path ("waypoints", "length") (default: {None})
 
-    w, h = img.shape[0], img.shape[1]
+        Returns:
+            path_img  {numpy array HxWx3, uint8} -- visualization image with path drawn
+            world_coords {numpy array Nx2, float64} -- coordinates of the path points
+            img_mask {numpy array HxW, uint8} -- textile mask
+        """
+        coordinates_sorted, img_mask = self._plan(
+            img_obj, img_bg, bg_thresh, spacing, dilation, planner, resolution,
+            levels, cancelled, timer, align)
+
+        with timer.stage("pixel2world"):
+            world_coords, pixel_coords = self._to_world(
+                coordinates_sorted, img_obj.shape, img_mask.shape, resolution)
+        if stats is not None:
+            before = world_coords
+            if align:
+                # the other stages are cached, only the rows are planned
+                plain, _ = self._plan(img_obj, img_bg, bg_thresh, spacing,
+                                      dilation, planner, resolution, levels)
+                before, _ = self._to_world(plain, img_obj.shape,
+                                           img_mask.shape, resolution)
+            stats["waypoints_before"] = len(before)
+            stats["length_before"] = path_length(before)
+        if tolerance:
+            with timer.stage("simplify"):
+                keep = simplify_path(world_coords, tolerance)
+                world_coords = world_coords[keep]
+                pixel_coords = pixel_coords[keep]
+        if stats is not None:
+            stats["waypoints"] = len(world_coords)
+            stats["length"] = path_length(world_coords)
+        with timer.stage("draw"):
+            path_img = draw_path(img_obj, pixel_coords)
+        return path_img, world_coords, img_mask
+
+    def iter_path(self, img_obj, img_bg, bg_thresh=50, spacing=20, dilation=10,
+                  planner="boustrophedon", resolution=None, levels=0,
+                  cancelled=None, timer=NO_TIMER, align=False, chunk=256):
+        """yields the world coordinates of the path in chunks of up to chunk
+        waypoints, e.g. to stream them into a file, see run for the arguments
+
+        The rows are ordered over the whole textile, so the path is planned
+        before the first chunk; the conversion to world coordinates is done
+        chunk by chunk. Merging waypoints (tolerance) needs the whole path
+        and is not supported.
+        """
+        coordinates_sorted, img_mask = self._plan(
+            img_obj, img_bg, bg_thresh, spacing, dilation, planner, resolution,
+            levels, cancelled, timer, align)
+        points = np.asarray(coordinates_sorted, dtype=np.float64).reshape(-1, 2)
+        for i in range(0, len(points), chunk):
+            with timer.stage("pixel2world"):
+                world_coords, _ = self._to_world(
+                    points[i:i + chunk], img_obj.shape, img_mask.shape,
+                    resolution)
+            yield world_coords
+
+    def _plan(self, img_obj, img_bg, bg_thresh, spacing, dilation, planner,
+              resolution, levels, cancelled=None, timer=NO_TIMER, align=False):
+        def check():
+            if cancelled is not None and cancelled():
+                raise PlanningCancelled()
+
+        with timer.stage("segmentation"):
+            mask_key = (image_key(img_obj), image_key(img_bg), bg_thresh,
+                        levels)
+            img_mask = self._cached("segmentation", mask_key, segment_mask_bg,
+                                    img_bg, img_obj, bg_thresh, levels, False)
+        check()
+        margin_key = mask_key + (dilation, resolution)
+        with timer.stage("margin"):
+            region, pixmm = self._cached("margin", margin_key, self._margin,
+                                         img_mask, img_obj.shape, dilation,
+                                         resolution)
+        check()
+        if resolution is not None:
+            step = row_step(spacing, resolution) * resolution
+            if not np.isclose(step, spacing):
+                warnings.warn("spacing {} mm is not a multiple of the "
+                              "resolution {} mm, the rows are {:g} mm "
+                              "apart".format(spacing, resolution, step))
+        rows_key = margin_key + (spacing, planner, align)
+        coordinates_sorted = self._cached("scanlines", rows_key, plan_rows,
+                                          region, pixmm, spacing, planner,
+                                          timer, align, cancelled)
+        check()
+        return coordinates_sorted, img_mask
+
+    def _to_world(self, coordinates_sorted, shape, mask_shape, resolution):
+        if resolution is None:
+            scale = shape[0] / mask_shape[0]
+            pixel_coords = np.asarray(
+                coordinates_sorted, dtype=np.float64).reshape(-1, 2) * scale
+            world_coords = pixel2world(pixel_coords, self.calibration)
+        else:
+            origin, _, _ = self.calibration.metric_grid(
+                (shape[1], shape[0]), resolution)
+            cells = np.asarray(
+                coordinates_sorted, dtype=np.float64).reshape(-1, 2)
+            world_coords = origin + cells * resolution
+            pixel_coords = self.calibration.world2pixel(world_coords)
+        return world_coords, pixel_coords
+
+
+def pixel_size(camera_dict, shape):
+    """ estimates the mean size of a pixel in mm from the image corners
+
+    Arguments:
+        camera_dict {Calibration} -- camera calibration
+        shape {tuple} -- image shape
+
+    Returns:
+        float -- mm per pixel
+    """
+    w, h = shape[0], shape[1]
     corners = np.asarray([[0., 0.], [w, 0], [0, h], [w, h]])
     corners_mm = pixel2world(corners, camera_dict, undistort=True)
 
@@ -31,18 +288,152 @@ def path_generation(camera_dict, img_obj, img_bg,
     b = (corners_mm[2, 0] - corners_mm[3, 0]) / w
     c = (corners_mm[2, 1] - corners_mm[0, 1]) / h
     d = (corners_mm[3, 1] - corners_mm[1, 1]) / h
-    pixmm = abs(np.mean([a, b, c, d]))
+    return abs(np.mean([a, b, c, d]))
+
 
-    _, thresh = cv2.threshold(img_mask, 127, 255, cv2.THRESH_BINARY)
+def row_step(spacing, pixmm):
+    """ number of mask rows between two path rows, the spacing is rounded
+        down to whole rows (and up to at least one)
+    """
+    # the tolerance keeps e.g. 0.3 / 0.1 from rounding down to 2
+    return max(int(spacing / pixmm + 1e-9), 1)
 
-    contours, _ = cv2.findContours(
-        thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-    contour_img = np.zeros(img_mask.shape)
-    cv2.drawContours(contour_img, contours, -1, (255, 0, 0),
-                     int(2 * dilation / pixmm),)
-    contour_img = np.array(contour_img, dtype=np.uint8)
+
+def plan_rows(region, pixmm, spacing, planner="boustrophedon",
+              timer=NO_TIMER, align=False, cancelled=None):
+    """ plans the path rows over a mask that already includes the margin
+
+    Arguments:
+        region {numpy array HxW, uint8} -- mask of the area to measure
+        pixmm {float} -- size of a mask pixel in mm
+        spacing {int} -- space in mm between two path rows
+
+    Keyword Arguments:
+        planner {str} -- "boustrophedon" or "meander" (default: {"boustrophedon"})
+        timer {StageTimer} -- records the scanline extraction and the
+                              ordering (default: {NO_TIMER})
+        align {bool} -- plan the rows in the direction that needs the fewest
+                        rows instead of along the mask rows (default: {False})
+        cancelled {callable} -- checked while the cells are ordered, raises
+                                PlanningCancelled if it returns True (default: {None})
+
+    Returns:
+        list of (u, v) tuples -- mask coordinates of the path
+    """
+    if align:
+        with timer.stage("align"):
+            angle = row_angle(region)
+            if angle != 0:
+                rotated, back = rotate_region(region, angle)
+        if angle != 0:
+            # the minimum width direction gives the fewest rows for a convex
+            # piece, for several pieces the plain rows can still be better
+            plain = plan_rows(region, pixmm, spacing, planner, timer,
+                              cancelled=cancelled)
+            points = np.asarray(plan_rows(rotated, pixmm, spacing, planner,
+                                          timer, cancelled=cancelled),
+                                dtype=np.float64)
+            points = points.reshape(-1, 2) @ back[:, :2].T + back[:, 2]
+            if ((len(points), path_length(points))
+                    < (len(plain), path_length(plain))):
+                return [tuple(p) for p in points]
+            return plain
+    skip_rows = row_step(spacing, pixmm)
+    if planner == "boustrophedon":
+        with timer.stage("scanlines"):
+            intervals = scanline_intervals(region, skip_rows)
+        with timer.stage("ordering"):
+            return order_cells(decompose_cells(intervals),
+                               cancelled=cancelled)
+    elif planner == "meander":
+        with timer.stage("scanlines"):
+            return scanline_waypoints(region, skip_rows)
+    raise ValueError("unknown planner {}".format(planner))
+
+
+def margin_mask(thresh, dilation_px):
+    """ grows a binary mask by dilation_px pixels, computed with a single
+        distance transform so the cost does not depend on the dilation
+
+    Arguments:
+        thresh {numpy array HxW, uint8} -- binary mask of the textile
+        dilation_px {float} -- margin in pixels
+
+    Returns:
+        numpy array HxW, uint8 -- mask of the textile including the margin
+    """
+    # distance of every pixel to the closest textile pixel
+    dist = cv2.distanceTransform(cv2.bitwise_not(thresh), cv2.DIST_L2, 5)
+    return cv2.compare(dist, float(dilation_px), cv2.CMP_LE)
+
+
+def draw_path(img, pixel_coords):
+    """ blends the path into the image
+
+    Arguments:
+        img {numpy array HxWx3, uint8} -- camera image
+        pixel_coords {numpy array Nx2} -- image coordinates of the path
+
+    Returns:
+        numpy array HxWx3, uint8 -- visualization image
+    """
+    contour_points = np.zeros(img.shape[:2], dtype=np.uint8)
+    points = [(int(u), int(v)) for u, v in np.rint(pixel_coords)]
+    for i in range(len(points) - 1):
+        cv2.line(contour_points, points[i], points[i + 1],
+                 (255, 255, 255), 8)
+    contour_points = cv2.cvtColor(contour_points, cv2.COLOR_GRAY2RGB)
+    return cv2.addWeighted(img, 0.7, contour_points, 0.3, 0)
+
+
+def scanline_waypoints(contour_img, skip_rows):
+    """ extracts the meander ordered waypoints from every skip_rows-th row
+        of the contour image, taking the first and last set pixel per row
+
+    Arguments:
+        contour_img {numpy array HxW, uint8} -- dilated mask or contour image
+        skip_rows {int} -- number of pixel rows between two path rows
+
+    Returns:
+        list of (u, v) tuples -- pixel coordinates of the path in meander order
+    """
+    rows = np.arange(0, contour_img.shape[0], skip_rows)
+    edges = contour_img[rows] > 0
+    hit = edges.any(axis=1)
+    rows, edges = rows[hit], edges[hit]
+    first = edges.argmax(axis=1)
+    last = edges.shape[1] - 1 - edges[:, ::-1].argmax(axis=1)
+
+    # rows with a single edge pixel only contribute one point
+    n_points = np.where(first == last, 1, 2)
+    u = np.stack((first, last), axis=1).ravel()
+    v = np.repeat(rows, 2)
+    keep = np.ones((len(rows), 2), dtype=bool)
+    keep[:, 1] = n_points == 2
+    u, v = u[keep.ravel()], v[keep.ravel()]
+
+    # flip every second row pair: points 0, 1, 3, 2 of each group of four,
+    # a trailing row keeps its order and incomplete groups are dropped
+    n_groups = len(u) // 4
+    order = (np.arange(n_groups)[:, None] * 4 + [0, 1, 3, 2]).ravel()
+    if len(u) % 4 == 2:
+        order = np.concatenate((order, [len(u) - 2, len(u) - 1]))
+    return list(zip(u[order].tolist(), v[order].tolist()))
+
+
+def scanline_waypoints_reference(contour_img, skip_rows):
+    """ reference implementation of scanline_waypoints with explicit loops
+        over every pixel, kept to validate the vectorized version
+
+    Arguments:
+        contour_img {numpy array HxW, uint8} -- image with the dilated contours
+        skip_rows {int} -- number of pixel rows between two path rows
+
+    Returns:
+        list of (u, v) tuples -- pixel coordinates of the path in meander order
+    """
+    w, h = contour_img.shape[0], contour_img.shape[1]
     contour_points = np.zeros(contour_img.shape, dtype=np.uint8)
-    skip_rows = int(spacing / pixmm)
     for row in range(0, w, skip_rows):
         for col in range(0, h, 1):
             if contour_img[row][col] > 0:
@@ -74,17 +465,7 @@ def path_generation(camera_dict, img_obj, img_bg,
         i = len(coordinates) - 1
         coordinates_sorted.append(coordinates[i - 1])
         coordinates_sorted.append(coordinates[i])
-
-    for i in range(len(coordinates_sorted) - 1):
-        cv2.line(contour_points,
-                 coordinates_sorted[i],
-                 coordinates_sorted[i + 1],
-                 (255, 255, 255), 8)
-
-    world_coords = pixel2world(np.asarray(coordinates_sorted), camera_dict)
-    contour_points = cv2.cvtColor(contour_points, cv2.COLOR_GRAY2RGB)
-    path_img = cv2.addWeighted(img, 0.7, contour_points, 0.3, 0)
-    return path_img, world_coords, img_mask
+    return [(int(u), int(v)) for u, v in coordinates_sorted]
 
 
 def pixel2world(points, camera_dict, undistort=True):
@@ -92,71 +473,144 @@ def pixel2world(points, camera_dict, undistort=True):
         with Z=0
     Arguments:
         points {numpy.array [n, 2]} -- n points consisting of u,v image coordinates
-        camera_dict {dict} -- camera dictionary that contains
+        camera_dict {dict or Calibration} -- camera dictionary that contains
                             camera_matrix, dist_coeff, rotation_vector
-                            and translation_vector
+                            and translation_vector, or a precompiled Calibration
+
+    Returns:
+        numpy array [n, 2]-- X, Y world coordinates
+    """
+    return as_calibration(camera_dict).pixel2world(points, undistort=undistort)
+
+
+class BackgroundSegmenter:
+    """background subtraction that never modifies its input images
+
+    The work buffers are allocated on the first call and reused as long as
+    the image size stays the same. With levels > 0 the difference image is
+    computed on a reduced resolution pyramid level and only the final mask
+    is upsampled to the input size.
+    """
+
+    def __init__(self, levels=0, border=200, prescaled=0):
+        self.levels = levels
+        # inputs that are already prescaled levels below the camera
+        # resolution get a proportionally smaller border and blur
+        self.prescaled = prescaled
+        self.border = border >> prescaled
+        self._buffers = {}
+        self._lut = np.empty((256, 1, 3), dtype=np.uint8)
+
+    def _buffer(self, name, shape):
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = self._buffers[name] = np.empty(shape, dtype=np.uint8)
+        return buf
+
+    def border_mean(self, img):
+        """ per channel mean of the image border that is used for the
+            brightness correction, computed from two sums without a mask
+
+        Arguments:
+            img {numpy array HxWx3, uint8} -- camera image
+
+        Returns:
+            numpy array [3,] -- mean of every channel
+        """
+        w, h, b = img.shape[0], img.shape[1], self.border
+        total = np.asarray(cv2.sumElems(img)[:3])
+        inner = np.asarray(cv2.sumElems(img[b:w - b + 1, b:h - b + 1])[:3])
+        n_border = w * h - (w - 2 * b + 1) * (h - 2 * b + 1)
+        return (total - inner) / n_border
+
+    def segment(self, img_background, img_object, bg_thresh, out=None,
+                upsample=True):
+        """ masks everything in img_object that differs from img_background
+
+        Arguments:
+            img_background {numpy array HxWx3, uint8} -- image of only the background
+            img_object {numpy array HxWx3, uint8} -- image with an object on the plate
+            bg_thresh {int} -- threshold for object masking
+
+        Keyword Arguments:
+            out {numpy array HxW, uint8} -- array the mask is written to (default: {None})
+            upsample {bool} -- return the mask in the input size instead of
+                               the pyramid level size (default: {True})
+
+        Returns:
+            numpy array HxW, uint8 -- mask with 255 for the object
+        """
+        w, h = img_background.shape[0], img_background.shape[1]
+        beta = self.border_mean(img_background) - self.border_mean(img_object)
+
+        bg, obj = img_background, img_object
+        for level in range(self.levels):
+            shape = ((bg.shape[0] + 1) // 2, (bg.shape[1] + 1) // 2, 3)
+            bg = cv2.pyrDown(bg, dst=self._buffer("bg%d" % level, shape))
+            obj = cv2.pyrDown(obj, dst=self._buffer("obj%d" % level, shape))
+
+        # brightness correction as a per channel lookup table, identical to
+        # convertScaleAbs(alpha=1, beta), then the difference in place
+        self._lut[:] = np.clip(np.rint(np.abs(
+            np.arange(256)[:, None, None] + beta)), 0, 255)
+        diff = self._buffer("diff", bg.shape)
+        cv2.LUT(obj, self._lut, dst=diff)
+        cv2.absdiff(bg, diff, dst=diff)
+
+        levels = self.levels + self.prescaled
+        ksize = max((15 >> levels) | 1, 3)
+        blur = self._buffer("blur", bg.shape)
+        cv2.GaussianBlur(diff, (ksize, ksize), 6 / 2 ** levels, dst=blur)
+        # any channel above the threshold is the same as the maximum above it
+        channel_max = self._buffer("max", bg.shape[:2])
+        np.max(blur, axis=2, out=channel_max)
+
+        if self.levels == 0 or not upsample:
+            if out is None:
+                out = np.empty(channel_max.shape, dtype=np.uint8)
+            cv2.threshold(channel_max, bg_thresh, 255, cv2.THRESH_BINARY,
+                          dst=out)
+            return out
+        if out is None:
+            out = np.empty((w, h), dtype=np.uint8)
+        small = self._buffer("mask", bg.shape[:2])
+        cv2.threshold(channel_max, bg_thresh, 255, cv2.THRESH_BINARY, dst=small)
+        cv2.resize(small, (h, w), dst=out, interpolation=cv2.INTER_LINEAR)
+        cv2.threshold(out, 127, 255, cv2.THRESH_BINARY, dst=out)
+        return out
+
+
+_segmenters = threading.local()
+
+
+def segment_mask_bg(img_background, img_object, bg_thresh, levels=0,
+                    upsample=True):
+    """ masks everything in img_object that differs from img_background,
+        the work buffers are kept per thread and pyramid level
+
+    Arguments:
+        img_background {numpy array HxWx3, uint8} -- image of only the background
+        img_object {numpy array HxWx3, uint8} -- image with an object on the plate
+        bg_thresh {int} -- threshold for object masking
+
+    Keyword Arguments:
+        levels {int} -- number of pyramid levels the mask is computed below
+                        the input resolution (default: {0})
+        upsample {bool} -- return the mask in the input size instead of
+                           the pyramid level size (default: {True})
 
     Returns:
-        numpy array [2,]-- X, Y world coordinates
+        numpy array HxW, uint8 -- mask with 255 for the object
     """
-    # Undistort pixel coordinates first
-    int_mtx = np.asarray(camera_dict["camera_matrix"])  # camera intrinsics
-    dst = np.asarray(camera_dict["dist_coeff"])  # distortion coefficients
-    rvec = np.asarray(camera_dict["rotation_vector"])
-    tvec = np.asarray(camera_dict["translation_vector"])
-    if undistort:
-        undist = cv2.undistortPoints(points.astype(np.float32), int_mtx, dst)
-        u_new = undist[:, :, 0] * int_mtx[0, 0] + int_mtx[0, 2]
-        v_new = undist[:, :, 1] * int_mtx[1, 1] + int_mtx[1, 2]
-        point_new = np.concatenate((u_new, v_new), axis=1)
-    else:
-        point_new = points
-    # since Z in world coordinates is 0, remove third column from
-    # transformation matrix
-    rot, _ = cv2.Rodrigues(rvec)
-    ext_mtx = np.concatenate((rot[:, :2], tvec), axis=1)
-    tf_mtx = np.matmul(int_mtx, ext_mtx)
-    # invert it
-    inv_tf = np.linalg.inv(tf_mtx)
-    # calculate world coordinates
-    im_coord = np.concatenate(
-        ((point_new), np.ones(
-            (point_new.shape[0], 1))), axis=1)[
-        :, :, np.newaxis]
-    world_coord = np.matmul(inv_tf, im_coord).squeeze()
-    if world_coord.shape == (3,):
-        world_coord = world_coord.reshape((1,3))
-    world_coord = (world_coord / world_coord[:, 2, None])
-    return world_coord[:, :2]
-
-
-def segment_mask_bg(img_background, img_object, bg_thresh):
-    w, h = img_background.shape[0], img_background.shape[1]
-    brightness_mask = np.ones((w, h), np.uint8)
-
-    cv2.rectangle(brightness_mask, (200, 200), (h - 200, w - 200), 0, -1)
-    brightness_mask = brightness_mask.astype(bool)
-    bg_mean = np.mean(img_background[brightness_mask], 0)
-    obj_mean = np.mean(img_object[brightness_mask], 0)
-    beta = bg_mean - obj_mean
-
-    img_object[:, :, 0] = cv2.convertScaleAbs(
-        img_object[:, :, 0], alpha=1., beta=beta[0])
-    img_object[:, :, 1] = cv2.convertScaleAbs(
-        img_object[:, :, 1], alpha=1., beta=beta[1])
-    img_object[:, :, 2] = cv2.convertScaleAbs(
-        img_object[:, :, 2], alpha=1., beta=beta[2])
-
-    img_sub = cv2.absdiff(img_background, img_object)
-    img_sub = cv2.GaussianBlur(img_sub, (15, 15), 6)
-    img_sub = (
-        (np.any(img_sub[:, :] > bg_thresh, axis=2)) * 255).astype(np.uint8)
-    return img_sub
+    segmenter = getattr(_segmenters, "level%d" % levels, None)
+    if segmenter is None:
+        segmenter = BackgroundSegmenter(levels)
+        setattr(_segmenters, "level%d" % levels, segmenter)
+    return segmenter.segment(img_background, img_object, bg_thresh,
+                             upsample=upsample)
 
 
 if __name__ == "__main__":
-    import yaml
-    
     import os
     w_path = os.path.dirname(os.path.realpath(__file__))
     os.chdir(w_path)
@@ -167,14 +621,14 @@ if __name__ == "__main__":
 
 
     # load calibration matrix
-    with open("calibration_matrix.yaml", "r") as f:
-        camera_dict = yaml.safe_load(f)
+    from calibration import Calibration
+    calibration = Calibration.from_yaml("calibration_matrix.yaml")
     # load background and object image
     img_bg = cv2.imread("background/2000.bmp")
     img_obj = cv2.imread("textiles/2001.bmp")
     # path generation
-    img, coords = path_generation(
-        camera_dict, img_obj, img_bg, bg_thresh=50, spacing=10, dilation=10)
+    img, coords, _ = path_generation(
+        calibration, img_obj, img_bg, bg_thresh=50, spacing=10, dilation=10)
 
     # show visualization image and coordinates
     cv2.namedWindow("EnzaTex", cv2.WINDOW_NORMAL)
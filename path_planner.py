@@ -0,0 +1,241 @@
+import cv2
+import numpy as np
+
+
+class PlanningCancelled(Exception):
+    pass
+
+
+def scanline_intervals(region, skip_rows):
+    """ finds all inside-intervals of every skip_rows-th row of a region mask
+
+    Arguments:
+        region {numpy array HxW, uint8} -- filled mask of the area to measure
+        skip_rows {int} -- number of pixel rows between two path rows
+
+    Returns:
+        list of (row, numpy array Kx2) -- first and last column of the
+                                          K intervals of every sampled row
+    """
+    rows = np.arange(0, region.shape[0], skip_rows)
+    inside = np.zeros((len(rows), region.shape[1] + 2), dtype=np.int8)
+    inside[:, 1:-1] = region[rows] > 0
+    change = np.diff(inside, axis=1)
+    r_start, c_start = np.nonzero(change == 1)
+    _, c_end = np.nonzero(change == -1)
+    c_end = c_end - 1
+    splits = np.searchsorted(r_start, np.arange(1, len(rows)))
+    intervals = []
+    for row, starts, ends in zip(rows, np.split(c_start, splits),
+                                 np.split(c_end, splits)):
+        intervals.append((int(row), np.stack((starts, ends), axis=1)))
+    return intervals
+
+
+def decompose_cells(intervals):
+    """ boustrophedon cell decomposition: consecutive row intervals that
+        overlap one to one belong to the same cell, every split or merge of
+        the region starts new cells
+
+    Arguments:
+        intervals {list} -- output of scanline_intervals
+
+    Returns:
+        list of cells, every cell is a list of (row, start, end) tuples
+    """
+    cells = []
+    prev, prev_cells = np.empty((0, 2), int), []
+    for row, cur in intervals:
+        overlap = ((prev[:, None, 0] <= cur[None, :, 1])
+                   & (cur[None, :, 0] <= prev[:, None, 1]))
+        cur_cells = []
+        for j, (start, end) in enumerate(cur):
+            parents = np.nonzero(overlap[:, j])[0]
+            if len(parents) == 1 and overlap[parents[0]].sum() == 1:
+                cell = prev_cells[parents[0]]
+            else:
+                cell = len(cells)
+                cells.append([])
+            cells[cell].append((row, int(start), int(end)))
+            cur_cells.append(cell)
+        prev, prev_cells = cur, cur_cells
+    return cells
+
+
+def _cell_path(cell, bottom_up, right_first):
+    rows = cell[::-1] if bottom_up else cell
+    points = []
+    for i, (row, start, end) in enumerate(rows):
+        ends = (end, start) if (i % 2 == 0) == right_first else (start, end)
+        points.append((ends[0], row))
+        if start != end:
+            points.append((ends[1], row))
+    return points
+
+
+def order_cells(cells, max_starts=16, max_work=250000, cancelled=None):
+    """ orders the cells and the meander direction inside every cell such that
+        the total traverse length is short (greedy nearest neighbour, started
+        from every entry corner of the first cells, the shortest result is kept)
+
+    Every greedy run compares each picked cell with all unvisited cells, so a
+    run costs about n^2 / 2 comparisons for n cells. The runs are limited to
+    max_work comparisons, a noisy mask with hundreds of cells gets a single
+    run.
+
+    Arguments:
+        cells {list} -- output of decompose_cells
+
+    Keyword Arguments:
+        max_starts {int} -- number of top most cells tried as start (default: {16})
+        max_work {int} -- comparisons of cells over all runs (default: {250000})
+        cancelled {callable} -- checked between the runs, raises
+                                PlanningCancelled if it returns True (default: {None})
+
+    Returns:
+        list of (u, v) tuples -- pixel coordinates of the path
+    """
+    if not cells:
+        return []
+    # four ways to traverse a cell: top or bottom first, left or right first
+    variants = [[_cell_path(cell, bottom_up, right_first)
+                 for bottom_up in (False, True)
+                 for right_first in (False, True)] for cell in cells]
+    entries = np.array([[v[0] for v in cell] for cell in variants], float)
+    exits = np.array([[v[-1] for v in cell] for cell in variants], float)
+    lengths = np.array([[path_length(v) for v in cell] for cell in variants])
+
+    entry_u, entry_v = entries[..., 0], entries[..., 1]
+    n = len(cells)
+    n_runs = min(4 * min(n, max_starts), max(1, 2 * max_work // (n * n)))
+    best_order, best_length = None, np.inf
+    for run in range(n_runs):
+        if cancelled is not None and cancelled():
+            raise PlanningCancelled()
+        start, start_variant = divmod(run, 4)
+        order = [(start, start_variant)]
+        total = lengths[start, start_variant]
+        pos = exits[start, start_variant]
+        # only the unvisited cells are compared, in ascending order so ties
+        # are broken towards the first cell
+        remaining = np.delete(np.arange(n), start)
+        while len(remaining):
+            dist = np.hypot(entry_u[remaining] - pos[0],
+                            entry_v[remaining] - pos[1])
+            dist += lengths[remaining]
+            i, variant = divmod(int(dist.argmin()), 4)
+            cell = remaining[i]
+            order.append((cell, variant))
+            total += dist[i, variant]
+            pos = exits[cell, variant]
+            remaining = np.delete(remaining, i)
+        if total < best_length:
+            best_order, best_length = order, total
+    return [p for cell, variant in best_order for p in variants[cell][variant]]
+
+
+def row_angle(region):
+    """ direction of the path rows that gives the fewest rows: along the
+        convex hull edge with the smallest extent of the region across it
+
+    Arguments:
+        region {numpy array HxW, uint8} -- filled mask of the area to measure
+
+    Returns:
+        float -- angle of the rows to the image rows in degrees, 0 if
+                 horizontal rows are as short across as any hull edge
+    """
+    contours, _ = cv2.findContours(region, cv2.RETR_EXTERNAL,
+                                   cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return 0.
+    hull = cv2.convexHull(np.concatenate(contours)).reshape(-1, 2)
+    hull = hull.astype(np.float64)
+    edges = np.roll(hull, -1, axis=0) - hull
+    angles = np.concatenate(([0.], np.arctan2(edges[:, 1], edges[:, 0])))
+    normals = np.stack((-np.sin(angles), np.cos(angles)), axis=1)
+    across = hull @ normals.T
+    widths = across.max(axis=0) - across.min(axis=0)
+    best = int(np.argmin(widths))
+    # keep horizontal rows unless rotating saves at least one pixel row
+    if widths[0] - widths[best] < 1:
+        return 0.
+    return float((np.degrees(angles[best]) + 90) % 180 - 90)
+
+
+def rotate_region(region, angle):
+    """ rotates a mask such that rows at angle become horizontal, the canvas
+        is enlarged to hold the whole rotated mask
+
+    Arguments:
+        region {numpy array HxW, uint8} -- mask
+        angle {float} -- row direction in degrees
+
+    Returns:
+        numpy array, uint8 -- rotated mask
+        numpy array 2x3 -- affine transformation from rotated to mask pixels
+    """
+    h, w = region.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.)
+    corners = np.array([[0, 0, 1], [w, 0, 1], [0, h, 1], [w, h, 1]], float)
+    rotated = corners @ matrix.T
+    low, high = rotated.min(axis=0), rotated.max(axis=0)
+    matrix[:, 2] -= low
+    size = tuple(np.ceil(high - low).astype(int))
+    rotated = cv2.warpAffine(region, matrix, size, flags=cv2.INTER_NEAREST)
+    return rotated, cv2.invertAffineTransform(matrix)
+
+
+def simplify_path(points, tolerance):
+    """ merges consecutive waypoints that lie within tolerance of the
+        segment between their neighbours (Ramer-Douglas-Peucker), so the
+        automat does not stop on nearly straight stretches
+
+    Arguments:
+        points {numpy array Nx2} -- path points, e.g. world coordinates in mm
+        tolerance {float} -- largest allowed deviation of the new path
+
+    Returns:
+        numpy array -- sorted indices of the kept points, always including
+                       the first and the last point
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = points[first], points[last]
+        inner = points[first + 1:last]
+        ab = b - a
+        # distance to the segment, not the line, so turning back on a row
+        # is never merged away
+        t = np.clip((inner - a) @ ab / max(ab @ ab, 1e-12), 0., 1.)
+        dist = np.linalg.norm(inner - (a + t[:, None] * ab), axis=1)
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.nonzero(keep)[0]
+
+
+def path_length(points):
+    """ length of the polyline through the given points
+
+    Arguments:
+        points {numpy array Nx2} -- path points, e.g. world coordinates in mm
+
+    Returns:
+        float -- summed distance between consecutive points
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 2:
+        return 0.
+    return float(np.linalg.norm(np.diff(points, axis=0), axis=1).sum())
@@ -0,0 +1,76 @@
+import threading
+
+from path_generator import PlanningCancelled
+
+
+class PathWorker:
+    """runs PathGenerator.run on a background thread
+
+    Only the latest request counts: submitting replaces a request that has
+    not been started yet and cancels the one that is running at the next
+    stage boundary. The result of every request that was not superseded is
+    passed to callback(tag, result), result is the exception if planning
+    failed. The callback is called from the worker thread.
+
+    cancel(wait=True) also waits until a running request has stopped, so
+    its input images can be overwritten afterwards.
+    """
+
+    def __init__(self, path_generator, callback):
+        self._generator = path_generator
+        self._callback = callback
+        self._condition = threading.Condition()
+        self._request = None
+        self._generation = 0
+        self._busy = False
+        self._running = True
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def submit(self, tag, *args, **kwargs):
+        with self._condition:
+            self._generation += 1
+            self._request = (self._generation, tag, args, kwargs)
+            self._condition.notify_all()
+
+    def cancel(self, wait=False):
+        with self._condition:
+            self._generation += 1
+            self._request = None
+            while wait and self._busy:
+                self._condition.wait()
+
+    def stop(self):
+        with self._condition:
+            self._generation += 1
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while self._running and self._request is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                generation, tag, args, kwargs = self._request
+                self._request = None
+                self._busy = True
+
+            def cancelled():
+                return generation != self._generation
+
+            try:
+                result = self._generator.run(*args, cancelled=cancelled,
+                                             **kwargs)
+            except PlanningCancelled:
+                # only raised once cancelled() is true, nothing is reported
+                result = None
+            except Exception as e:
+                result = e
+            if not cancelled():
+                self._callback(tag, result)
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
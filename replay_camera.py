@@ -0,0 +1,173 @@
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+from background_model import BackgroundModel, average_frames
+from frame_ring import FrameRing, downscale
+
+# replays recorded frames with the interface of camera.Camera, for tests
+# and throughput measurements without camera hardware
+
+REPLAY_SOURCE = "replay"
+RING_SIZE = 4
+IMAGE_TYPES = ("*.png", "*.bmp", "*.jpg", "*.tif")
+
+
+def bgr2bayer(bgr):
+    """ samples a BGR image with an RGGB bayer pattern, the inverse of the
+        camera's COLOR_BayerRGGB2BGR conversion
+
+    Arguments:
+        bgr {numpy array HxWx3, uint8} -- image
+
+    Returns:
+        numpy array HxW, uint8 -- raw bayer frame
+    """
+    raw = np.empty(bgr.shape[:2], dtype=bgr.dtype)
+    raw[0::2, 0::2] = bgr[0::2, 0::2, 2]
+    raw[0::2, 1::2] = bgr[0::2, 1::2, 1]
+    raw[1::2, 0::2] = bgr[1::2, 0::2, 1]
+    raw[1::2, 1::2] = bgr[1::2, 1::2, 0]
+    return raw
+
+
+def save_stack(filenames, filename, bayer=False):
+    """ writes recorded images into one .npy stack that can be memory-mapped
+
+    Arguments:
+        filenames {list of str} -- images of the same size
+        filename {str} -- output .npy file
+
+    Keyword Arguments:
+        bayer {bool} -- store raw bayer frames instead of BGR images (default: {False})
+    """
+    first = cv2.imread(filenames[0])
+    shape = first.shape[:2] if bayer else first.shape
+    stack = np.lib.format.open_memmap(
+        filename, mode="w+", dtype=np.uint8, shape=(len(filenames),) + shape)
+    for i, name in enumerate(filenames):
+        img = first if i == 0 else cv2.imread(name)
+        stack[i] = bgr2bayer(img) if bayer else img
+    stack.flush()
+    del stack
+
+
+class Camera:
+    """serves frames from a directory of images or a memory-mapped .npy
+    stack (NxHxWx3 BGR or NxHxW raw bayer) in a loop
+
+    Keyword Arguments:
+        source {str} -- directory or .npy file (default: {REPLAY_SOURCE})
+        fps {float} -- emulated frame rate, None for as fast as possible (default: {20.})
+        bayer {bool} -- serve raw bayer frames that are demosaiced on capture
+                        like with the real camera (default: {False})
+        streaming {bool} -- drain frames into a ring buffer on a thread (default: {True})
+    """
+
+    def __init__(self, source=REPLAY_SOURCE, fps=20., bayer=False,
+                 streaming=True):
+        if os.path.isdir(source):
+            filenames = sorted(
+                f for t in IMAGE_TYPES for f in glob.glob(os.path.join(source, t)))
+            if not filenames:
+                raise FileNotFoundError("no images in {}".format(source))
+            # directories are read once, a stack is only memory-mapped
+            self._frames = [cv2.imread(f) for f in filenames]
+        else:
+            self._frames = np.load(source, mmap_mode="r")
+        self._bayer = bayer
+        self._period = 1. / fps if fps else 0.
+        self._index = 0
+        self._next_time = time.monotonic()
+        self._ring = FrameRing(self._read, RING_SIZE) if streaming else None
+
+    def _read(self):
+        if self._period:
+            delay = self._next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_time = max(self._next_time, time.monotonic()) + self._period
+        frame = np.array(self._frames[self._index % len(self._frames)])
+        self._index += 1
+        if self._bayer and frame.ndim == 3:
+            frame = bgr2bayer(frame)
+        return frame
+
+    def _convert(self, frame):
+        if frame.ndim == 2:
+            return cv2.cvtColor(frame, cv2.COLOR_BayerRGGB2BGR)
+        return frame
+
+    def _raw_frames(self, count):
+        if self._ring is not None:
+            yield from self._ring.iter_new(count)
+            return
+        for i in range(count):
+            yield self._read()
+
+    def capture(self):
+        '''retrieve the first replayed frame after the call
+        returns a HxWx3 numpy array (BGR image)
+        '''
+        if self._ring is not None:
+            _, frame = self._ring.wait_newer(time.monotonic())
+        else:
+            frame = self._read()
+        return self._convert(frame)
+
+    def preview(self, levels=2):
+        '''newest replayed frame reduced by 2**levels, without waiting
+        returns (timestamp, hxwx3 BGR image) or None before the first frame
+        '''
+        if self._ring is not None:
+            latest = self._ring.latest()
+            if latest is None:
+                return None
+            timestamp, frame = latest
+        else:
+            timestamp, frame = time.monotonic(), self._read()
+        return timestamp, downscale(frame, levels, bayer=frame.ndim == 2)
+
+    def capture_average(self, count=8, method="mean"):
+        '''average count new frames before demosaicing
+        returns a HxWx3 numpy array (BGR image)
+        '''
+        return self._convert(average_frames(self._raw_frames(count), method))
+
+    def capture_background(self, count=16):
+        '''capture count new frames of the empty plate
+        returns a BackgroundModel with the mean image and the sensor noise
+        '''
+        return BackgroundModel.from_frames(self._raw_frames(count), self._convert)
+
+    def destroy(self):
+        if self._ring is not None:
+            self._ring.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.destroy()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="measure the capture rate of recorded frames")
+    parser.add_argument("source", help="directory of images or .npy stack")
+    parser.add_argument("--fps", type=float, default=20.)
+    parser.add_argument("--bayer", action="store_true")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    with Camera(args.source, fps=args.fps, bayer=args.bayer) as camera:
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            camera.capture()
+        elapsed = time.perf_counter() - start
+    print("{} captures in {:.2f} s ({:.1f} fps)".format(
+        args.frames, elapsed, args.frames / elapsed))
@@ -0,0 +1,317 @@
+import csv
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+from path_planner import path_length
+
+# index of all samples in one SQLite file: parameters, file paths, content
+# hashes and the coordinates as float32 blobs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backgrounds (
+    id INTEGER PRIMARY KEY,
+    hash TEXT UNIQUE NOT NULL,
+    file TEXT,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    timestamp TEXT NOT NULL,
+    spacing REAL,
+    dilation REAL,
+    bg_thresh REAL,
+    planner TEXT,
+    align INTEGER,
+    tolerance REAL,
+    waypoints INTEGER,
+    path_length REAL,
+    textile_file TEXT,
+    textile_hash TEXT,
+    background_id INTEGER REFERENCES backgrounds(id),
+    coordinates_file TEXT,
+    coordinates BLOB,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS samples_timestamp ON samples(timestamp);
+CREATE INDEX IF NOT EXISTS samples_params ON samples(spacing, dilation, bg_thresh);
+CREATE INDEX IF NOT EXISTS samples_textile_hash ON samples(textile_hash);
+"""
+
+# columns added to the samples table after the first version, added to
+# existing archives when they are opened
+ADDED_COLUMNS = (("align", "INTEGER"), ("tolerance", "REAL"))
+
+# columns of a sample returned by get and find, with the background file
+COLUMNS = ("name", "timestamp", "spacing", "dilation", "bg_thresh", "planner",
+           "align", "tolerance", "waypoints", "path_length", "textile_file",
+           "textile_hash", "background_file", "background_hash",
+           "coordinates_file", "timings")
+
+# planning parameters that find can filter by
+PARAMS = ("spacing", "dilation", "bg_thresh", "planner", "align", "tolerance",
+          "waypoints")
+
+
+def content_hash(img):
+    """ hash of the pixel data (not of the encoded file) """
+    img = np.ascontiguousarray(img)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((img.shape, img.dtype.str)).encode())
+    h.update(img)
+    return h.hexdigest()
+
+
+def pack_coordinates(coords):
+    return np.ascontiguousarray(coords, dtype="<f4").reshape(-1, 2).tobytes()
+
+
+def unpack_coordinates(blob):
+    return np.frombuffer(blob, dtype="<f4").reshape(-1, 2).astype(np.float64)
+
+
+class SampleArchive:
+    """SQLite index of the samples
+
+        archive = SampleArchive("archive.sqlite")
+        archive.add_sample("2001", coords, spacing=20, ...)
+        archive.find(since="2024-05-01", spacing=20)
+        archive.coordinates("2001")
+
+    Backgrounds are stored once per content hash, samples that were taken
+    with the same background refer to the same row. Timestamps are ISO
+    strings, so they sort and compare as text.
+    """
+
+    def __init__(self, filename="archive.sqlite"):
+        self.filename = filename
+        self._db = sqlite3.connect(filename)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        existing = {row[1] for row in
+                    self._db.execute("PRAGMA table_info(samples)")}
+        with self._db:
+            for column, sql_type in ADDED_COLUMNS:
+                if column not in existing:
+                    self._db.execute("ALTER TABLE samples ADD COLUMN {} {}"
+                                     .format(column, sql_type))
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_background(self, file, background_hash, timestamp=None):
+        """ returns the id and file of the background with this hash, a new
+            background is added with file
+        """
+        row = self._db.execute("SELECT id, file FROM backgrounds WHERE hash=?",
+                               (background_hash,)).fetchone()
+        if row is not None:
+            return row
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO backgrounds (hash, file, timestamp) VALUES (?, ?, ?)",
+                (background_hash, file, _timestamp(timestamp)))
+        return cursor.lastrowid, file
+
+    def background_file(self, background_hash):
+        """ file of a background with this hash, None if it is new """
+        row = self._db.execute("SELECT file FROM backgrounds WHERE hash=?",
+                               (background_hash,)).fetchone()
+        return None if row is None else row[0]
+
+    def add_sample(self, name, coords, spacing=None, dilation=None,
+                   bg_thresh=None, planner=None, align=None, tolerance=None,
+                   textile_file=None, textile_hash=None, background_file=None,
+                   background_hash=None, coordinates_file=None, timings=None,
+                   timestamp=None):
+        """ adds a sample or replaces the sample with the same name
+
+        Arguments:
+            name {str} -- sample name
+            coords {numpy array Nx2} -- world coordinates of the path in mm
+
+        Keyword Arguments:
+            align {bool} -- rows turned to the fewest rows direction (default: {None})
+            tolerance {float} -- waypoint merging tolerance in mm, None if
+                                 the waypoints were not merged (default: {None})
+            timings {dict} -- stage durations in s (default: {None})
+            timestamp {datetime or str} -- default: now
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        background_id = None
+        if background_hash is not None:
+            background_id, _ = self.add_background(background_file,
+                                                   background_hash, timestamp)
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO samples (name, timestamp, spacing, "
+                "dilation, bg_thresh, planner, align, tolerance, waypoints, "
+                "path_length, textile_file, textile_hash, background_id, "
+                "coordinates_file, coordinates, timings) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, _timestamp(timestamp), spacing, dilation, bg_thresh,
+                 planner, None if align is None else int(align), tolerance,
+                 coords.shape[0], path_length(coords), textile_file,
+                 textile_hash, background_id, coordinates_file,
+                 pack_coordinates(coords),
+                 None if timings is None else json.dumps(timings)))
+
+    def exists(self, name):
+        return self._db.execute("SELECT 1 FROM samples WHERE name=?",
+                                (name,)).fetchone() is not None
+
+    def get(self, name):
+        """ sample as a dict of COLUMNS, None if it is not archived """
+        samples = self._select("WHERE s.name=?", (name,))
+        return samples[0] if samples else None
+
+    def coordinates(self, name):
+        row = self._db.execute("SELECT coordinates FROM samples WHERE name=?",
+                               (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return unpack_coordinates(row[0])
+
+    def find(self, name=None, since=None, until=None, textile_hash=None,
+             background_hash=None, limit=None, **params):
+        """ samples matching all given conditions, ordered by timestamp
+
+        Keyword Arguments:
+            name {str} -- glob pattern of the sample name, e.g. "20*"
+            since, until {datetime or str} -- timestamp range, until is
+                                              exclusive
+            **params -- one of PARAMS, either a value or a (min, max) tuple
+        """
+        conditions, args = [], []
+        if name is not None:
+            conditions.append("s.name GLOB ?")
+            args.append(name)
+        if since is not None:
+            conditions.append("s.timestamp >= ?")
+            args.append(_timestamp(since))
+        if until is not None:
+            conditions.append("s.timestamp < ?")
+            args.append(_timestamp(until))
+        if textile_hash is not None:
+            conditions.append("s.textile_hash = ?")
+            args.append(textile_hash)
+        if background_hash is not None:
+            conditions.append("b.hash = ?")
+            args.append(background_hash)
+        for key, value in params.items():
+            if key not in PARAMS:
+                raise ValueError("unknown parameter {}".format(key))
+            if isinstance(value, tuple):
+                conditions.append("s.{} BETWEEN ? AND ?".format(key))
+                args.extend(value)
+            else:
+                conditions.append("s.{} = ?".format(key))
+                args.append(value)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        where += " ORDER BY s.timestamp"
+        if limit is not None:
+            where += " LIMIT {:d}".format(limit)
+        return self._select(where, args)
+
+    def _select(self, where, args):
+        rows = self._db.execute(
+            "SELECT s.name, s.timestamp, s.spacing, s.dilation, s.bg_thresh, "
+            "s.planner, s.align, s.tolerance, s.waypoints, s.path_length, "
+            "s.textile_file, "
+            "s.textile_hash, b.file, b.hash, s.coordinates_file, s.timings "
+            "FROM samples s LEFT JOIN backgrounds b ON s.background_id = b.id "
+            + where, args)
+        samples = []
+        for row in rows:
+            sample = dict(zip(COLUMNS, row))
+            if sample["align"] is not None:
+                sample["align"] = bool(sample["align"])
+            if sample["timings"] is not None:
+                sample["timings"] = json.loads(sample["timings"])
+            samples.append(sample)
+        return samples
+
+    def import_folders(self, log_pattern=os.path.join("log", "log_*.csv"),
+                       textile_dir="textiles", background_dir="background",
+                       coordinate_dir="coordinates", hash_images=True):
+        """ indexes the samples of the session logs written before the
+            archive existed, returns the number of imported samples
+
+        Samples that are already archived are skipped. With hash_images
+        the images are read to hash them, which deduplicates the
+        backgrounds but takes a moment per sample.
+        """
+        import cv2
+        n_imported = 0
+        for log_file in sorted(glob.glob(log_pattern)):
+            with open(log_file, newline="") as f:
+                rows = list(csv.reader(f, delimiter=",", quotechar="|"))
+            for row in rows[1:]:
+                name = row[0]
+                coordinates_file = os.path.join(coordinate_dir, name + ".txt")
+                if self.exists(name) or not os.path.exists(coordinates_file):
+                    continue
+                textile_file = os.path.join(textile_dir, name + ".png")
+                background_file = os.path.join(background_dir, name + ".png")
+                textile_hash = background_hash = None
+                if hash_images:
+                    img = cv2.imread(textile_file)
+                    img_bg = cv2.imread(background_file)
+                    textile_hash = None if img is None else content_hash(img)
+                    background_hash = (None if img_bg is None
+                                       else content_hash(img_bg))
+                self.add_sample(
+                    name, np.loadtxt(coordinates_file, ndmin=2),
+                    spacing=float(row[2]), dilation=float(row[3]),
+                    bg_thresh=float(row[4]), textile_file=textile_file,
+                    textile_hash=textile_hash, background_file=background_file,
+                    background_hash=background_hash,
+                    coordinates_file=coordinates_file, timestamp=row[1])
+                n_imported += 1
+        return n_imported
+
+
+def _timestamp(timestamp):
+    if timestamp is None:
+        return datetime.now().isoformat(" ")
+    if isinstance(timestamp, datetime):
+        return timestamp.isoformat(" ")
+    return str(timestamp)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="query the sample archive")
+    parser.add_argument("--archive", default="archive.sqlite")
+    parser.add_argument("--import-logs", action="store_true",
+                        help="index the samples of the CSV session logs")
+    parser.add_argument("--name", default=None, help="glob pattern, e.g. 20*")
+    parser.add_argument("--since", default=None, help="e.g. 2024-05-01")
+    parser.add_argument("--until", default=None)
+    parser.add_argument("--spacing", type=float, default=None)
+    parser.add_argument("--dilation", type=float, default=None)
+    parser.add_argument("--threshold", type=float, default=None)
+    args = parser.parse_args()
+
+    with SampleArchive(args.archive) as archive:
+        if args.import_logs:
+            print("{} samples imported".format(archive.import_folders()))
+        params = {key: value for key, value in (
+            ("spacing", args.spacing), ("dilation", args.dilation),
+            ("bg_thresh", args.threshold)) if value is not None}
+        for sample in archive.find(args.name, args.since, args.until, **params):
+            print("{name:<16} {timestamp:<27} spacing {spacing:g}, dilation "
+                  "{dilation:g}, threshold {bg_thresh:g}: {waypoints} "
+                  "waypoints, {path_length:.0f} mm".format(**sample))
@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+# synthetic background/textile image pairs for benchmarks
+
+SHAPES = ("convex", "concave", "holes", "multiple")
+IMAGE_SHAPE = (2048, 2448)
+
+
+def _draw_textile(mask, shape):
+    w, h = mask.shape
+    center = (h // 2, w // 2)
+    if shape == "convex":
+        cv2.ellipse(mask, center, (h // 4, w // 5), 20, 0, 360, 255, -1)
+    elif shape == "concave":
+        # star shaped piece, every row crosses it up to four times
+        angles = np.linspace(0, 2 * np.pi, 11)[:-1]
+        radius = np.where(np.arange(10) % 2 == 0, w // 3, w // 8)
+        points = np.stack((center[0] + radius * np.cos(angles),
+                           center[1] + radius * np.sin(angles)), axis=1)
+        cv2.fillPoly(mask, [points.astype(np.int32)], 255)
+    elif shape == "holes":
+        cv2.ellipse(mask, center, (h // 4, w // 4), 0, 0, 360, 255, -1)
+        cv2.circle(mask, (center[0] - h // 10, center[1]), w // 14, 0, -1)
+        cv2.circle(mask, (center[0] + h // 10, center[1] + w // 12), w // 16, 0, -1)
+    elif shape == "multiple":
+        cv2.rectangle(mask, (h // 10, w // 10), (h // 3, w // 3), 255, -1)
+        cv2.circle(mask, (2 * h // 3, w // 4), w // 7, 255, -1)
+        cv2.ellipse(mask, (h // 2, 3 * w // 4), (h // 5, w // 10), -15, 0, 360, 255, -1)
+    else:
+        raise ValueError("unknown shape {}".format(shape))
+
+
+def make_scene(shape="convex", noise=4., seed=0, size=IMAGE_SHAPE):
+    """ creates a background image and an image with a textile on the plate
+
+    Arguments:
+        shape {str} -- one of SHAPES
+
+    Keyword Arguments:
+        noise {float} -- standard deviation of the sensor noise (default: {4.})
+        seed {int} -- random seed (default: {0})
+        size {tuple} -- image size (rows, columns) (default: {IMAGE_SHAPE})
+
+    Returns:
+        img_bg {numpy array HxWx3, uint8} -- image of only the background
+        img_obj {numpy array HxWx3, uint8} -- image with the textile
+        mask {numpy array HxW, uint8} -- ground truth mask of the textile
+    """
+    rng = np.random.default_rng(seed)
+    w, h = size
+    # plate with a smooth illumination gradient
+    gradient = np.linspace(100, 140, h, dtype=np.float32)[None, :, None]
+    plate = np.broadcast_to(gradient, (w, h, 3))
+
+    mask = np.zeros(size, dtype=np.uint8)
+    _draw_textile(mask, shape)
+    textile = np.empty((w, h, 3), dtype=np.float32)
+    textile[:] = (40, 160, 70)
+    # woven texture
+    textile += 15 * np.sin(np.arange(h, dtype=np.float32) / 3)[None, :, None]
+
+    img_bg = plate + rng.normal(0, noise, (w, h, 3)).astype(np.float32)
+    # slightly different exposure of the second image
+    img_obj = np.where(mask[:, :, None] > 0, textile, plate + 5)
+    img_obj += rng.normal(0, noise, (w, h, 3)).astype(np.float32)
+    return (np.clip(img_bg, 0, 255).astype(np.uint8),
+            np.clip(img_obj, 0, 255).astype(np.uint8), mask)
@@ -0,0 +1,51 @@
+import numpy as np
+from background_model import BackgroundModel, average_frames
+
+
+def test_mean_of_many_frames():
+    frames = (np.full((4, 6), 255, np.uint8) for _ in range(300))
+    np.testing.assert_array_equal(average_frames(frames), 255)
+
+
+def test_mean_rounds():
+    frames = [np.full((2, 2), value, np.uint8) for value in (1, 2)]
+    np.testing.assert_array_equal(average_frames(frames), 2)
+    frames = [np.full((2, 2), value, np.uint8) for value in (1, 1, 2)]
+    np.testing.assert_array_equal(average_frames(frames), 1)
+
+
+def noisy_frames(n=20):
+    rng = np.random.default_rng(0)
+    return [np.clip(100 + rng.normal(0, 3, (8, 10)), 0, 255).astype(np.uint8)
+            for _ in range(n)]
+
+
+def test_model_from_frames():
+    frames = noisy_frames()
+    model = BackgroundModel.from_frames(frames)
+    stack = np.stack(frames).astype(np.float64)
+    assert model.n_frames == len(frames)
+    np.testing.assert_array_equal(model.image, np.rint(stack.mean(axis=0)))
+    assert model.std.dtype == np.uint16
+    np.testing.assert_allclose(model.std / 256, stack.std(axis=0), atol=1e-2)
+
+
+def test_model_save_load(tmp_path):
+    model = BackgroundModel.from_frames(noisy_frames())
+    filename = str(tmp_path / "model.npz")
+    with open(filename, "wb") as f:
+        model.save(f)
+    loaded = BackgroundModel.load(filename)
+    np.testing.assert_array_equal(loaded.image, model.image)
+    np.testing.assert_array_equal(loaded.std, model.std)
+    assert loaded.n_frames == model.n_frames
+    assert loaded.timestamp == model.timestamp
+
+
+def test_model_load_float_std(tmp_path):
+    filename = str(tmp_path / "model.npz")
+    np.savez(filename, image=np.zeros((2, 2), np.uint8),
+             std=np.full((2, 2), 1.5, np.float32), n_frames=16, timestamp=0.)
+    model = BackgroundModel.load(filename)
+    assert model.std.dtype == np.uint16
+    np.testing.assert_array_equal(model.std, 384)
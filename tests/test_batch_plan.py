@@ -0,0 +1,31 @@
+import os
+
+from batch_plan import find_samples
+
+
+def touch(filename):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    open(filename, "wb").close()
+
+
+def test_formats(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    touch(os.path.join("textiles", "a.webp"))
+    touch(os.path.join("textiles", "b.npy"))
+    touch(os.path.join("textiles", "b.png"))
+    touch(os.path.join("textiles", ".c.png.tmp"))
+    touch(os.path.join("background", "a.npy"))
+    touch(os.path.join("background", "b.png"))
+    assert find_samples(["textiles/*"], "background") == [
+        ("a", os.path.join("textiles", "a.webp"),
+         os.path.join("background", "a.npy")),
+        ("b", os.path.join("textiles", "b.png"),
+         os.path.join("background", "b.png"))]
+
+
+def test_sample_names(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    touch(os.path.join("textiles", "a.webp"))
+    assert find_samples(["a", "d"], "background", "model.npz") == [
+        ("a", os.path.join("textiles", "a.webp"), "model.npz"),
+        ("d", os.path.join("textiles", "d.png"), "model.npz")]
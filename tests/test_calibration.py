@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+from calibration import Calibration
+
+
+def pixel2world_dict(points, camera_dict):
+    # dict based pixel2world of path_generator before Calibration existed
+    int_mtx = np.asarray(camera_dict["camera_matrix"])
+    dst = np.asarray(camera_dict["dist_coeff"])
+    rvec = np.asarray(camera_dict["rotation_vector"])
+    tvec = np.asarray(camera_dict["translation_vector"])
+    undist = cv2.undistortPoints(points.astype(np.float32), int_mtx, dst)
+    u_new = undist[:, :, 0] * int_mtx[0, 0] + int_mtx[0, 2]
+    v_new = undist[:, :, 1] * int_mtx[1, 1] + int_mtx[1, 2]
+    point_new = np.concatenate((u_new, v_new), axis=1)
+    rot, _ = cv2.Rodrigues(rvec)
+    ext_mtx = np.concatenate((rot[:, :2], tvec), axis=1)
+    inv_tf = np.linalg.inv(np.matmul(int_mtx, ext_mtx))
+    im_coord = np.concatenate(
+        (point_new, np.ones((point_new.shape[0], 1))), axis=1)[:, :, None]
+    world_coord = np.matmul(inv_tf, im_coord).squeeze().reshape(-1, 3)
+    world_coord = world_coord / world_coord[:, 2, None]
+    return world_coord[:, :2]
+
+
+@pytest.fixture(scope="module")
+def pixels():
+    rng = np.random.default_rng(0)
+    return rng.uniform((0, 0), (2448, 2048), (500, 2))
+
+
+def test_round_trip(camera_dict, pixels):
+    calibration = Calibration.from_dict(camera_dict)
+    back = calibration.world2pixel(calibration.pixel2world(pixels))
+    assert np.abs(back - pixels).max() < 1e-3
+
+
+def test_matches_dict_pixel2world(camera_dict, pixels):
+    calibration = Calibration.from_dict(camera_dict)
+    expected = pixel2world_dict(pixels, camera_dict)
+    # the dict version undistorts float32 points
+    np.testing.assert_allclose(calibration.pixel2world(pixels), expected,
+                               atol=1e-3)
+
+
+def test_no_points(camera_dict):
+    calibration = Calibration.from_dict(camera_dict)
+    for undistort in (True, False):
+        assert calibration.pixel2world(np.empty((0, 2)),
+                                       undistort).shape == (0, 2)
+    for distort in (True, False):
+        assert calibration.world2pixel(np.empty((0, 2)),
+                                       distort).shape == (0, 2)
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+from coordinate_io import (CoordinateFile, CoordinateWriter, calibration_hash,
+                           diff_coordinates, export_path, read_coordinates,
+                           write_coordinates)
+from coordinate_lut import CoordinateLUT, build_lut
+from path_generator import PathGenerator
+from synthetic_scenes import make_scene
+
+COORDS = np.array([[0., 0.], [10.25, -3.5], [250.125, 400.], [1e3, 1.01]])
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int32"])
+def test_round_trip(tmp_path, calibration, dtype):
+    filename = str(tmp_path / "2001.wpt")
+    params = {"spacing": 20, "dilation": 10, "tolerance": None}
+    write_coordinates(filename, COORDS, sample="2001",
+                      calibration=calibration, params=params, dtype=dtype)
+    f = CoordinateFile(filename)
+    assert f.complete
+    assert len(f) == len(COORDS)
+    assert f.sample == "2001"
+    assert f.params == params
+    assert f.calibration == calibration_hash(calibration)
+    np.testing.assert_allclose(f.coords, COORDS, atol=1e-2)
+    np.testing.assert_allclose(read_coordinates(filename), f.coords)
+
+
+def test_chunks(tmp_path):
+    filename = str(tmp_path / "chunks.wpt")
+    with CoordinateWriter(filename) as f:
+        for chunk in np.array_split(COORDS, 3):
+            f.append(chunk)
+            f.flush()
+            # readable while it is written
+            partial = CoordinateFile(filename)
+            assert not partial.complete
+            assert len(partial) == f.n_points
+    assert CoordinateFile(filename).complete
+    np.testing.assert_allclose(read_coordinates(filename), COORDS, rtol=1e-6)
+
+
+def test_empty(tmp_path):
+    filename = str(tmp_path / "empty.wpt")
+    write_coordinates(filename, np.empty((0, 2)))
+    f = CoordinateFile(filename)
+    assert f.complete
+    assert f.coords.shape == (0, 2)
+
+
+def test_truncated(tmp_path):
+    filename = str(tmp_path / "truncated.wpt")
+    write_coordinates(filename, COORDS)
+    # cut into the last point
+    with open(filename, "r+b") as f:
+        f.truncate(os.path.getsize(filename) - 3)
+    f = CoordinateFile(filename)
+    assert not f.complete
+    np.testing.assert_allclose(f.coords, COORDS[:-1], rtol=1e-6)
+
+
+def test_not_a_waypoint_file(tmp_path):
+    filename = str(tmp_path / "text.wpt")
+    np.savetxt(filename, COORDS)
+    with pytest.raises(ValueError):
+        CoordinateFile(filename)
+
+
+def test_text_file(tmp_path):
+    filename = str(tmp_path / "2001.txt")
+    np.savetxt(filename, COORDS[:1], fmt="%10.5f")
+    np.testing.assert_allclose(read_coordinates(filename), COORDS[:1])
+
+
+def test_diff(tmp_path):
+    a, b = str(tmp_path / "a.wpt"), str(tmp_path / "b.wpt")
+    write_coordinates(a, COORDS, params={"spacing": 20, "dilation": 10})
+    moved = np.concatenate((COORDS, [[1e3, 5.01]]))
+    write_coordinates(b, moved, params={"spacing": 15, "dilation": 10})
+    d = diff_coordinates(a, b)
+    assert d["params"] == {"spacing": (20, 15)}
+    assert d["waypoints"] == (4, 5)
+    assert d["length"][1] == pytest.approx(d["length"][0] + 4, abs=1e-3)
+    assert d["distance"] == pytest.approx(4, abs=1e-3)
+
+
+@pytest.fixture(scope="module")
+def lut_file(calibration, tmp_path_factory):
+    filename = str(tmp_path_factory.mktemp("lut") / "coordinate_lut.npy")
+    build_lut(calibration, filename, size=(64, 48))
+    return filename
+
+
+def test_lut_hash(calibration, lut_file):
+    assert (calibration_hash(CoordinateLUT(lut_file, calibration))
+            == calibration_hash(calibration))
+    assert (calibration_hash(CoordinateLUT(lut_file))
+            == calibration_hash(CoordinateLUT(lut_file)))
+    assert (calibration_hash(CoordinateLUT(lut_file))
+            != calibration_hash(calibration))
+
+
+def test_export_path_with_lut(tmp_path, calibration, lut_file):
+    bg, obj, _ = make_scene("convex")
+    lut = CoordinateLUT(lut_file, calibration)
+    filename = str(tmp_path / "export.wpt")
+    n_points = export_path(PathGenerator(lut), filename, obj, bg,
+                           sample="2001", spacing=20)
+    f = CoordinateFile(filename)
+    assert f.complete and len(f) == n_points > 0
+    assert f.calibration == calibration_hash(calibration)
+    _, expected, _ = PathGenerator(calibration).run(obj, bg, spacing=20)
+    np.testing.assert_allclose(f.coords, expected, atol=.01)
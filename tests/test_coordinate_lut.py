@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from coordinate_lut import CoordinateLUT, build_lut
+from path_generator import pixel_size
+
+@pytest.fixture(scope="module")
+def lut_file(calibration, tmp_path_factory):
+    filename = str(tmp_path_factory.mktemp("lut") / "coordinate_lut.npy")
+    build_lut(calibration, filename)
+    return filename
+
+
+def test_inside(calibration, lut_file):
+    points = np.random.default_rng(0).uniform((0, 0), (2447, 2047), (500, 2))
+    np.testing.assert_allclose(CoordinateLUT(lut_file).pixel2world(points),
+                               calibration.pixel2world(points), atol=1e-2)
+
+
+def test_pixel_size(calibration, lut_file):
+    # the corners queried by pixel_size lie outside of the table
+    expected = pixel_size(calibration, (2048, 2448))
+    assert pixel_size(CoordinateLUT(lut_file), (2048, 2448)) == pytest.approx(
+        expected, rel=0.01)
+    assert pixel_size(CoordinateLUT(lut_file, calibration),
+                      (2048, 2448)) == pytest.approx(expected, rel=1e-6)
+
+
+def test_metric_grid(calibration, lut_file):
+    lut = CoordinateLUT(lut_file, calibration)
+    origin, _, _ = lut.metric_grid((2448, 2048), 2.)
+    np.testing.assert_array_equal(
+        origin, calibration.metric_grid((2448, 2048), 2.)[0])
+    with pytest.raises(ValueError):
+        CoordinateLUT(lut_file).metric_grid((2448, 2048), 2.)
+    with pytest.raises(ValueError):
+        CoordinateLUT(lut_file).world2pixel(origin)
@@ -0,0 +1,81 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+from coordinate_io import read_coordinates
+from file_writer import FileWriter, load_image
+
+
+def image(value=0):
+    img = np.zeros((40, 60, 3), np.uint8)
+    img[10:30, 20:40] = (value, 255 - value, 128)
+    return img
+
+
+@pytest.mark.parametrize("image_format", ["png", "webp", "npy"])
+def test_lossless_formats(tmp_path, image_format):
+    with FileWriter(image_format) as writer:
+        filename = writer.write_image(str(tmp_path / "2001.png"), image(7))
+    assert filename.endswith(writer.extension)
+    np.testing.assert_array_equal(load_image(filename), image(7))
+
+
+def test_atomic_rename(tmp_path):
+    filename = str(tmp_path / "model.npz")
+    seen = []
+    started, release = threading.Event(), threading.Event()
+
+    def write(f):
+        # the target appears only once the write is complete
+        seen.append(os.path.exists(filename))
+        f.write(b"partial")
+        started.set()
+        release.wait(5)
+        f.write(b" complete")
+
+    with FileWriter() as writer:
+        writer.write_file(filename, write)
+        assert started.wait(5)
+        assert not os.path.exists(filename)
+        release.set()
+        writer.flush()
+        with open(filename, "rb") as f:
+            assert f.read() == b"partial complete"
+    assert seen == [False]
+    assert os.listdir(tmp_path) == ["model.npz"]
+
+
+def test_flush(tmp_path):
+    writer = FileWriter()
+    names = [writer.write_image(str(tmp_path / "{}.png".format(i)), image(i))
+             for i in range(20)]
+    writer.write_coordinates(str(tmp_path / "c.txt"), np.ones((3, 2)))
+    writer.flush()
+    assert all(os.path.exists(name) for name in names)
+    np.testing.assert_allclose(read_coordinates(str(tmp_path / "c.txt")), 1)
+    writer.close()
+
+
+def test_failures(tmp_path):
+    missing = str(tmp_path / "missing" / "2001.png")
+    with FileWriter() as writer:
+        writer.write_image(missing, image())
+        writer.write_file(str(tmp_path / "broken.npz"),
+                          lambda f: 1 / 0)
+        writer.write_image(str(tmp_path / "ok.png"), image())
+        writer.flush()
+        assert writer.pop_failed() == [missing, str(tmp_path / "broken.npz")]
+        assert writer.pop_failed() == []
+    # no temporary files are left behind
+    assert os.listdir(tmp_path) == ["ok.png"]
+
+
+def test_unchanged_is_linked(tmp_path):
+    with FileWriter() as writer:
+        a = writer.write_image(str(tmp_path / "a.png"), image(1), unchanged=True)
+        b = writer.write_image(str(tmp_path / "b.png"), image(1), unchanged=True)
+        c = writer.write_image(str(tmp_path / "c.png"), image(2), unchanged=True)
+    assert os.path.samefile(a, b)
+    assert not os.path.samefile(a, c)
+    np.testing.assert_array_equal(load_image(c), image(2))
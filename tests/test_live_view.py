@@ -0,0 +1,24 @@
+import numpy as np
+from live_view import LiveView
+
+
+def live_view(calibration):
+    return LiveView(None, calibration, lambda: None)
+
+
+def test_empty_plate(calibration):
+    background = np.full((512, 612, 3), 100, np.uint8)
+    overlay, waypoints, length = live_view(calibration).process(
+        background.copy(), background, 50, 20, 10)
+    assert overlay.shape == background.shape
+    assert waypoints == 0
+    assert length == 0.
+
+
+def test_textile(calibration):
+    background = np.full((512, 612, 3), 100, np.uint8)
+    frame = background.copy()
+    frame[200:300, 200:400] = 250
+    _, waypoints, length = live_view(calibration).process(frame, background, 50, 20, 10)
+    assert waypoints > 0
+    assert length > 0.
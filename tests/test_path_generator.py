@@ -0,0 +1,25 @@
+import warnings
+
+import numpy as np
+import pytest
+from path_generator import PathGenerator, row_step
+from synthetic_scenes import make_scene
+
+
+def test_row_step():
+    assert row_step(20, 2.) == 10
+    assert row_step(25, 2.) == 12
+    assert row_step(.3, .1) == 3
+    assert row_step(1, 5.) == 1
+
+
+def test_resolution_spacing_warning(calibration):
+    bg, obj, _ = make_scene("convex")
+    generator = PathGenerator(calibration)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        generator.run(obj, bg, spacing=20, resolution=2.)
+    with pytest.warns(UserWarning, match="rows are 24 mm apart"):
+        _, coords, _ = generator.run(obj, bg, spacing=25, resolution=2.)
+    rows = np.unique(np.round(coords[:, 1], 6))
+    assert np.allclose(np.diff(rows) % 24, 0)
@@ -0,0 +1,219 @@
+import cv2
+import numpy as np
+import pytest
+from path_planner import (PlanningCancelled, decompose_cells, order_cells,
+                          rotate_region, row_angle, scanline_intervals,
+                          simplify_path)
+
+
+def concave():
+    # a U, the rows through the arms have two intervals
+    region = np.zeros((120, 150), np.uint8)
+    region[10:110, 10:140] = 255
+    region[10:80, 50:100] = 0
+    return region
+
+
+def holes():
+    region = np.zeros((150, 200), np.uint8)
+    cv2.ellipse(region, (100, 75), (90, 65), 0, 0, 360, 255, -1)
+    cv2.circle(region, (60, 75), 20, 0, -1)
+    cv2.rectangle(region, (110, 50), (150, 100), 0, -1)
+    return region
+
+
+def several_pieces():
+    region = np.zeros((150, 200), np.uint8)
+    cv2.rectangle(region, (5, 5), (60, 140), 255, -1)
+    cv2.circle(region, (130, 50), 35, 255, -1)
+    cv2.ellipse(region, (140, 120), (50, 20), 15, 0, 360, 255, -1)
+    region[75, 100] = 255  # a single pixel row interval
+    return region
+
+
+SHAPES = {"concave": concave, "holes": holes,
+          "several_pieces": several_pieces}
+
+
+def intervals_reference(region, skip_rows):
+    intervals = []
+    for row in range(0, region.shape[0], skip_rows):
+        inside, current = [], None
+        for col, value in enumerate(region[row] > 0):
+            if value and current is None:
+                current = col
+            elif not value and current is not None:
+                inside.append((current, col - 1))
+                current = None
+        if current is not None:
+            inside.append((current, region.shape[1] - 1))
+        intervals.append((row, inside))
+    return intervals
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("skip_rows", [1, 4, 9])
+def test_scanline_intervals(shape, skip_rows):
+    region = SHAPES[shape]()
+    intervals = scanline_intervals(region, skip_rows)
+    assert [(row, [tuple(i) for i in inside.tolist()])
+            for row, inside in intervals] == intervals_reference(region,
+                                                                 skip_rows)
+
+
+def test_scanline_intervals_border():
+    region = np.full((3, 5), 255, np.uint8)
+    region[1, 2] = 0
+    assert [(row, inside.tolist())
+            for row, inside in scanline_intervals(region, 1)] == [
+        (0, [[0, 4]]), (1, [[0, 1], [3, 4]]), (2, [[0, 4]])]
+
+
+def all_intervals(region, skip_rows):
+    return sorted((row, int(start), int(end))
+                  for row, inside in scanline_intervals(region, skip_rows)
+                  for start, end in inside)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_cells_cover_every_interval_once(shape):
+    region = SHAPES[shape]()
+    cells = decompose_cells(scanline_intervals(region, 5))
+    assert sorted(i for cell in cells for i in cell) == all_intervals(region, 5)
+    for cell in cells:
+        # one interval per row, consecutive sampled rows that overlap
+        rows = [row for row, _, _ in cell]
+        assert rows == list(range(rows[0], rows[-1] + 1, 5))
+        for (_, s0, e0), (_, s1, e1) in zip(cell, cell[1:]):
+            assert s0 <= e1 and s1 <= e0
+
+
+def test_cells_split_and_merge():
+    # the U splits into two arms and merges again below
+    cells = decompose_cells(scanline_intervals(concave(), 5))
+    assert len(cells) == 3
+    region = np.zeros((60, 60), np.uint8)
+    cv2.rectangle(region, (5, 5), (20, 50), 255, -1)
+    cv2.rectangle(region, (40, 5), (55, 50), 255, -1)
+    assert len(decompose_cells(scanline_intervals(region, 5))) == 2
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("skip_rows", [3, 7])
+def test_order_cells_covers_every_row_once(shape, skip_rows):
+    region = SHAPES[shape]()
+    path = order_cells(decompose_cells(scanline_intervals(region, skip_rows)))
+    expected = all_intervals(region, skip_rows)
+    # the path runs along every row interval exactly once, from one end to
+    # the other, single pixel intervals are one waypoint
+    runs, i = [], 0
+    while i < len(path):
+        u0, v0 = path[i]
+        u1, v1 = path[i + 1] if i + 1 < len(path) else (None, None)
+        if v1 == v0 and (v0, min(u0, u1), max(u0, u1)) in expected:
+            runs.append((v0, min(u0, u1), max(u0, u1)))
+            i += 2
+        else:
+            runs.append((v0, u0, u0))
+            i += 1
+    assert sorted(runs) == expected
+
+
+def noisy_cells():
+    rng = np.random.default_rng(1)
+    region = (rng.random((512, 612)) < .006).astype(np.uint8) * 255
+    region = cv2.dilate(region, np.ones((9, 9), np.uint8))
+    return decompose_cells(scanline_intervals(region, 5))
+
+
+def test_order_cells_many_cells():
+    cells = noisy_cells()
+    assert len(cells) > 500
+    path = order_cells(cells)
+    ends = {(u, row) for cell in cells for row, start, end in cell
+            for u in (start, end)}
+    assert len(path) == len(ends)
+    assert set(path) == ends
+
+
+def test_order_cells_work_limit():
+    cells = noisy_cells()[:60]
+    runs = []
+
+    def cancelled():
+        runs.append(1)
+        return False
+
+    order_cells(cells, cancelled=cancelled)
+    assert len(runs) == 64
+    runs.clear()
+    order_cells(cells, max_work=len(cells) ** 2, cancelled=cancelled)
+    assert len(runs) == 2
+
+
+def test_order_cells_cancelled():
+    with pytest.raises(PlanningCancelled):
+        order_cells(noisy_cells(), cancelled=lambda: True)
+
+
+def test_simplify_path():
+    # a straight row with intermediate points, a corner and a turn back
+    points = np.array([[0, 0], [1, .01], [2, -.01], [3, 0], [3, 1], [0, 1],
+                       [2, 1]], float)
+    assert simplify_path(points, .1).tolist() == [0, 3, 4, 5, 6]
+    assert simplify_path(points, 0.).tolist() == [0, 1, 2, 3, 4, 5, 6]
+    assert simplify_path(points[:2], 1.).tolist() == [0, 1]
+    assert simplify_path(np.empty((0, 2)), 1.).tolist() == []
+
+
+def test_simplify_path_keeps_tolerance():
+    rng = np.random.default_rng(0)
+    points = np.cumsum(rng.normal(0, 1, (300, 2)), axis=0)
+    keep = simplify_path(points, 2.)
+    assert keep[0] == 0 and keep[-1] == len(points) - 1
+    for first, last in zip(keep, keep[1:]):
+        a, b = points[first], points[last]
+        for p in points[first + 1:last]:
+            t = np.clip((p - a) @ (b - a) / ((b - a) @ (b - a)), 0, 1)
+            assert np.linalg.norm(p - (a + t * (b - a))) <= 2.
+
+
+def rotated_rectangle(angle, size=(160, 40)):
+    region = np.zeros((300, 300), np.uint8)
+    box = cv2.boxPoints(((150, 150), size, angle)).astype(np.int32)
+    cv2.fillPoly(region, [box], 255)
+    return region
+
+
+@pytest.mark.parametrize("angle", [25, -30, 60])
+def test_row_angle(angle):
+    # the rows run along the long side of the rectangle
+    found = row_angle(rotated_rectangle(angle))
+    assert abs((found - angle + 90) % 180 - 90) < 2
+
+
+def test_row_angle_keeps_horizontal_rows():
+    assert row_angle(rotated_rectangle(0)) == 0.
+    assert row_angle(np.zeros((20, 20), np.uint8)) == 0.
+    # a disc is as wide in every direction
+    region = np.zeros((200, 200), np.uint8)
+    cv2.circle(region, (100, 100), 80, 255, -1)
+    assert row_angle(region) == 0.
+
+
+@pytest.mark.parametrize("angle", [25, -30, 90])
+def test_rotate_region(angle):
+    region = rotated_rectangle(angle)
+    rotated, back = rotate_region(region, angle)
+    # the whole mask is kept and its rows are horizontal
+    assert abs(int(np.count_nonzero(rotated)) - np.count_nonzero(region)) < (
+        .03 * np.count_nonzero(region))
+    rows = np.nonzero(rotated.any(axis=1))[0]
+    cols = np.nonzero(rotated.any(axis=0))[0]
+    assert rows[-1] - rows[0] < 45 and cols[-1] - cols[0] > 150
+    # back maps rotated pixels into the mask
+    v, u = np.nonzero(rotated)
+    points = np.stack((u, v), axis=1) @ back[:, :2].T + back[:, 2]
+    points = np.rint(points).astype(int)
+    inside = region[np.clip(points[:, 1], 0, 299), np.clip(points[:, 0], 0, 299)]
+    assert np.mean(inside > 0) > .97
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from path_generator import PlanningCancelled
+from path_worker import PathWorker
+
+
+class SlowGenerator:
+    """ checks cancelled() every few milliseconds, records when it ends """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.finished = threading.Event()
+
+    def run(self, steps, cancelled=None):
+        self.started.set()
+        try:
+            for _ in range(steps):
+                time.sleep(0.005)
+                if cancelled():
+                    raise PlanningCancelled()
+            return steps
+        finally:
+            self.finished.set()
+
+
+def test_result():
+    results = []
+    done = threading.Event()
+    worker = PathWorker(SlowGenerator(), lambda tag, result: (
+        results.append((tag, result)), done.set()))
+    worker.submit("full", 3)
+    assert done.wait(5)
+    worker.stop()
+    assert results == [("full", 3)]
+
+
+def test_cancel_wait():
+    results = []
+    generator = SlowGenerator()
+    worker = PathWorker(generator, lambda tag, result: results.append(tag))
+    worker.submit("full", 1000)
+    assert generator.started.wait(5)
+    worker.cancel(wait=True)
+    assert generator.finished.is_set()
+    worker.stop()
+    assert results == []
+
+
+def test_cancel_idle():
+    worker = PathWorker(SlowGenerator(), lambda tag, result: None)
+    worker.cancel(wait=True)
+    worker.stop()
@@ -0,0 +1,159 @@
+import csv
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+from sample_archive import SampleArchive, content_hash
+
+COORDS = np.array([[0., 0.], [100.5, 0.], [100.5, 20.], [0., 20.]])
+
+
+@pytest.fixture
+def archive(tmp_path):
+    with SampleArchive(str(tmp_path / "archive.sqlite")) as archive:
+        yield archive
+
+
+def test_content_hash():
+    img = np.arange(24, dtype=np.uint8).reshape(2, 4, 3)
+    assert content_hash(img) == content_hash(img.copy())
+    assert content_hash(img) == content_hash(np.asfortranarray(img))
+    assert content_hash(img) != content_hash(img.reshape(4, 2, 3))
+    assert content_hash(img) != content_hash(img.astype(np.uint16))
+    changed = img.copy()
+    changed[1, 2, 0] += 1
+    assert content_hash(img) != content_hash(changed)
+
+
+def test_add_and_get(archive):
+    archive.add_sample("2001", COORDS, spacing=20, dilation=10, bg_thresh=50,
+                       planner="boustrophedon", textile_file="t/2001.png",
+                       textile_hash="t1", background_file="b/2001.png",
+                       background_hash="b1", coordinates_file="c/2001.txt",
+                       timings={"segmentation": .1},
+                       timestamp="2024-05-01 10:00:00")
+    assert archive.exists("2001")
+    assert not archive.exists("2002")
+    sample = archive.get("2001")
+    assert sample["spacing"] == 20 and sample["planner"] == "boustrophedon"
+    assert sample["waypoints"] == 4
+    assert sample["path_length"] == pytest.approx(100.5 * 2 + 20)
+    assert sample["background_file"] == "b/2001.png"
+    assert sample["background_hash"] == "b1"
+    assert sample["timings"] == {"segmentation": .1}
+    np.testing.assert_allclose(archive.coordinates("2001"), COORDS, rtol=1e-6)
+    assert archive.get("2002") is None
+    with pytest.raises(KeyError):
+        archive.coordinates("2002")
+
+
+def test_replace(archive):
+    archive.add_sample("2001", COORDS, spacing=20)
+    archive.add_sample("2001", COORDS[:2], spacing=15)
+    assert len(archive.find()) == 1
+    assert archive.get("2001")["spacing"] == 15
+    assert archive.coordinates("2001").shape == (2, 2)
+
+
+def test_background_deduplication(archive):
+    for name in ("2001", "2002"):
+        archive.add_sample(name, COORDS, background_file=name + ".png",
+                           background_hash="same")
+    archive.add_sample("2003", COORDS, background_file="2003.png",
+                       background_hash="other")
+    # the file of the first sample with this background is kept
+    assert archive.background_file("same") == "2001.png"
+    assert archive.background_file("new") is None
+    assert [s["background_file"] for s in archive.find()] == [
+        "2001.png", "2001.png", "2003.png"]
+    n_backgrounds = archive._db.execute(
+        "SELECT COUNT(*) FROM backgrounds").fetchone()[0]
+    assert n_backgrounds == 2
+
+
+def test_find(archive):
+    for i, (spacing, day) in enumerate([(10, 1), (20, 2), (20, 3), (30, 4)]):
+        archive.add_sample("20{:02d}".format(i), COORDS[:i + 1],
+                           spacing=spacing, planner="boustrophedon",
+                           textile_hash="t{}".format(i),
+                           background_hash="b{}".format(i % 2),
+                           timestamp="2024-05-0{} 12:00:00".format(day))
+    archive.add_sample("3000", COORDS, spacing=20, timestamp="2024-05-05")
+
+    def names(**kwargs):
+        return [s["name"] for s in archive.find(**kwargs)]
+
+    assert names() == ["2000", "2001", "2002", "2003", "3000"]
+    assert names(name="20*") == ["2000", "2001", "2002", "2003"]
+    assert names(since="2024-05-02", until="2024-05-04") == ["2001", "2002"]
+    assert names(spacing=20) == ["2001", "2002", "3000"]
+    assert names(spacing=(15, 30), name="20*") == ["2001", "2002", "2003"]
+    assert names(waypoints=(2, 3)) == ["2001", "2002"]
+    assert names(textile_hash="t3") == ["2003"]
+    assert names(background_hash="b1") == ["2001", "2003"]
+    assert names(limit=2) == ["2000", "2001"]
+    with pytest.raises(ValueError):
+        archive.find(color="red")
+
+
+def test_reopen(tmp_path):
+    filename = str(tmp_path / "archive.sqlite")
+    with SampleArchive(filename) as archive:
+        archive.add_sample("2001", COORDS, spacing=20)
+    with SampleArchive(filename) as archive:
+        assert archive.get("2001")["spacing"] == 20
+
+
+def test_import_folders(tmp_path, archive):
+    os.makedirs(tmp_path / "log")
+    os.makedirs(tmp_path / "coordinates")
+    with open(tmp_path / "log" / "log_1.csv", "w", newline="") as f:
+        writer = csv.writer(f, delimiter=",", quotechar="|")
+        writer.writerow(["sample", "time", "spacing", "dilation", "thresh"])
+        writer.writerow(["2001", "2024-05-01 10:00:00", "20", "10", "50"])
+        writer.writerow(["2002", "2024-05-01 10:05:00", "20", "10", "50"])
+    np.savetxt(tmp_path / "coordinates" / "2001.txt", COORDS)
+    kwargs = dict(log_pattern=str(tmp_path / "log" / "log_*.csv"),
+                  textile_dir=str(tmp_path / "textiles"),
+                  background_dir=str(tmp_path / "background"),
+                  coordinate_dir=str(tmp_path / "coordinates"))
+    # 2002 has no coordinates and is skipped
+    assert archive.import_folders(**kwargs) == 1
+    assert archive.import_folders(**kwargs) == 0
+    sample = archive.get("2001")
+    assert sample["timestamp"] == "2024-05-01 10:00:00"
+    assert sample["bg_thresh"] == 50
+    np.testing.assert_allclose(archive.coordinates("2001"), COORDS)
+
+
+def test_row_alignment_and_tolerance(archive):
+    archive.add_sample("2001", COORDS, planner="boustrophedon", align=True,
+                       tolerance=.5)
+    archive.add_sample("2002", COORDS, planner="boustrophedon", align=False)
+    sample = archive.get("2001")
+    assert sample["align"] is True and sample["tolerance"] == .5
+    sample = archive.get("2002")
+    assert sample["align"] is False and sample["tolerance"] is None
+    assert [s["name"] for s in archive.find(align=True)] == ["2001"]
+    assert [s["name"] for s in archive.find(tolerance=(0, 1))] == ["2001"]
+
+
+def test_add_columns_to_old_archive(tmp_path):
+    filename = str(tmp_path / "archive.sqlite")
+    db = sqlite3.connect(filename)
+    db.executescript("""
+        CREATE TABLE samples (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL,
+            timestamp TEXT NOT NULL, spacing REAL, dilation REAL,
+            bg_thresh REAL, planner TEXT, waypoints INTEGER, path_length REAL,
+            textile_file TEXT, textile_hash TEXT, background_id INTEGER,
+            coordinates_file TEXT, coordinates BLOB, timings TEXT);
+        INSERT INTO samples (name, timestamp, spacing) VALUES
+            ('1999', '2023-01-01', 20);
+    """)
+    db.close()
+    with SampleArchive(filename) as archive:
+        old = archive.get("1999")
+        assert old["spacing"] == 20 and old["align"] is None
+        archive.add_sample("2001", COORDS, align=True, tolerance=1.)
+        assert archive.get("2001")["tolerance"] == 1.
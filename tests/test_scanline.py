@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from path_generator import scanline_waypoints, scanline_waypoints_reference
+
+
+def as_ints(points):
+    return [(int(u), int(v)) for u, v in points]
+
+
+def random_mask(rng, shape, density):
+    mask = (rng.random(shape) < density).astype(np.uint8) * 255
+    mask[0, rng.integers(shape[1])] = 255  # never empty
+    return mask
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("skip_rows", [1, 3, 7])
+def test_random_masks(seed, skip_rows):
+    rng = np.random.default_rng(seed)
+    shape = tuple(rng.integers(5, 60, 2))
+    mask = random_mask(rng, shape, rng.uniform(0.005, 0.3))
+    assert (as_ints(scanline_waypoints(mask, skip_rows))
+            == as_ints(scanline_waypoints_reference(mask, skip_rows)))
+
+
+@pytest.mark.parametrize("n_rows", range(1, 10))
+def test_single_pixel_rows(n_rows):
+    # rows alternate between one and two points, so the number of points
+    # runs through every remainder modulo 4
+    mask = np.zeros((2 * n_rows, 30), np.uint8)
+    for row in range(n_rows):
+        mask[2 * row, row + 3] = 255
+        if row % 2:
+            mask[2 * row, 25 - row] = 255
+    assert (as_ints(scanline_waypoints(mask, 2))
+            == as_ints(scanline_waypoints_reference(mask, 2)))
+
+
+@pytest.mark.parametrize("n_points", range(1, 14))
+def test_point_counts(n_points):
+    mask = np.zeros((n_points, 20), np.uint8)
+    mask[np.arange(n_points), np.arange(n_points) % 20] = 255
+    assert (as_ints(scanline_waypoints(mask, 1))
+            == as_ints(scanline_waypoints_reference(mask, 1)))
@@ -0,0 +1,90 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+from automat_server import AutomatServer
+from transport import (HEADER, AutomatConnection, body_size,
+                       pack_coordinates, recv_exactly, unpack_coordinates)
+
+
+def wait_for(condition, timeout=5.):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            return False
+        time.sleep(.01)
+    return True
+
+
+def unpack(message):
+    header = message[:HEADER.size]
+    body = message[HEADER.size:]
+    assert len(body) == body_size(header)
+    return unpack_coordinates(header, body)
+
+
+def test_pack_round_trip():
+    coords = np.array([[0., 0.], [123.456, -7.891], [1e4, 2.005]])
+    sample, back = unpack(pack_coordinates("2001", coords))
+    assert sample == 2001
+    # 1/100 mm on the wire
+    np.testing.assert_allclose(back, coords, atol=.005)
+
+
+def test_pack_empty():
+    sample, back = unpack(pack_coordinates(7, np.empty((0, 2))))
+    assert sample == 7
+    assert back.shape == (0, 2)
+
+
+@pytest.fixture
+def server():
+    server = AutomatServer(("127.0.0.1", 0), ack=True, verbose=False)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_send_with_ack(server):
+    with AutomatConnection(*server.server_address) as connection:
+        assert wait_for(lambda: connection.connected)
+        for sample in range(3):
+            connection.send(sample, np.ones((10, 2)), wait_ack=True)
+
+
+def test_reconnect_after_peer_closed():
+    listener = socket.create_server(("127.0.0.1", 0))
+    listener.settimeout(5.)
+    with AutomatConnection(*listener.getsockname(), poll=.05) as connection:
+        peer, _ = listener.accept()
+        assert wait_for(lambda: connection.connected)
+        # the automat restarts
+        peer.close()
+        peer, _ = listener.accept()
+        assert wait_for(lambda: connection.connected)
+        connection.send(5, np.full((3, 2), 2.5))
+        header = recv_exactly(peer, HEADER.size)
+        sample, coords = unpack_coordinates(
+            header, recv_exactly(peer, body_size(header)))
+        assert sample == 5
+        np.testing.assert_allclose(coords, 2.5)
+        peer.close()
+    listener.close()
+
+
+def test_send_after_peer_closed_fails():
+    listener = socket.create_server(("127.0.0.1", 0))
+    listener.settimeout(5.)
+    # the connection thread does not check the socket before the send
+    with AutomatConnection(*listener.getsockname(), poll=60.) as connection:
+        peer, _ = listener.accept()
+        assert wait_for(lambda: connection.connected)
+        peer.close()
+        time.sleep(.1)
+        with pytest.raises(ConnectionError):
+            connection.send(5, np.ones((3, 2)))
+    listener.close()
@@ -0,0 +1,204 @@
+import select
+import socket
+import struct
+import threading
+
+import numpy as np
+
+# wire format: int32 sample, int32 number of waypoints N, then N x (int32 X,
+# int32 Y) in 1/100 mm, all in native byte order
+HEADER = struct.Struct("ii")
+ACK = struct.Struct("i")
+COORD_DTYPE = np.dtype("i4")
+COORD_SCALE = 100
+
+
+def pack_coordinates(sample, coords):
+    """ packs the header and all coordinates into one buffer
+
+    Arguments:
+        sample {int or str} -- numeric sample name
+        coords {numpy array Nx2} -- world coordinates in mm
+
+    Returns:
+        bytes -- message for the automat
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    values = np.rint(coords * COORD_SCALE).astype(COORD_DTYPE)
+    return HEADER.pack(int(sample), coords.shape[0]) + values.tobytes()
+
+
+def unpack_coordinates(header, body):
+    """ inverse of pack_coordinates, header and body are received separately
+
+    Arguments:
+        header {bytes} -- first HEADER.size bytes of a message
+        body {bytes} -- the remaining 8 * N bytes
+
+    Returns:
+        sample {int} -- sample name
+        coords {numpy array Nx2} -- world coordinates in mm
+    """
+    sample, n_points = HEADER.unpack(header)
+    values = np.frombuffer(body, dtype=COORD_DTYPE, count=2 * n_points)
+    return sample, values.reshape(n_points, 2) / COORD_SCALE
+
+
+def body_size(header):
+    return HEADER.unpack(header)[1] * 2 * COORD_DTYPE.itemsize
+
+
+def recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    while size:
+        n = sock.recv_into(view, size)
+        if n == 0:
+            raise ConnectionError("connection closed by peer")
+        view, size = view[n:], size - n
+    return bytes(buffer)
+
+
+def peer_closed(sock):
+    """ True if the peer closed the connection, checked without blocking,
+        data the peer sent unasked (e.g. a late acknowledgement) is discarded
+    """
+    while select.select([sock], [], [], 0)[0]:
+        try:
+            if not sock.recv(4096):
+                return True
+        except OSError:
+            return True
+    return False
+
+
+class AutomatConnection:
+    """persistent connection to the automat
+
+    The connection is established and re-established on a background thread
+    with exponential backoff, so the caller never waits for the automat to
+    come up. While connected, the thread checks the idle socket every poll
+    seconds and drops it when the automat closed it (e.g. on a restart), and
+    send checks it once more before sending. send fails fast with a
+    ConnectionError while not connected.
+    """
+
+    def __init__(self, ip, port, timeout=5., max_backoff=30., poll=.5):
+        self.address = (ip, port)
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.poll = poll
+        self._sock = None
+        self._lock = threading.Lock()
+        self._lost = threading.Event()
+        self._running = True
+        self._thread = threading.Thread(target=self._connect, daemon=True)
+        self._thread.start()
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def _connect(self):
+        backoff = .5
+        while self._running:
+            if self._sock is not None:
+                if self._lost.wait(self.poll):
+                    self._lost.clear()
+                    continue
+                with self._lock:
+                    if self._sock is not None and peer_closed(self._sock):
+                        self._sock.close()
+                        self._sock = None
+                        print("Socket closed by the automat")
+                continue
+            try:
+                sock = socket.create_connection(self.address, self.timeout)
+            except OSError:
+                self._lost.wait(backoff)
+                backoff = min(2 * backoff, self.max_backoff)
+                continue
+            sock.settimeout(self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._sock = sock
+            backoff = .5
+            print("Socket connected")
+
+    def _drop(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+        self._lost.set()
+
+    def send(self, sample, coords, wait_ack=False):
+        """ sends all coordinates of a sample with a single sendall
+
+        Arguments:
+            sample {int or str} -- numeric sample name
+            coords {numpy array Nx2} -- world coordinates in mm
+
+        Keyword Arguments:
+            wait_ack {bool} -- wait for the automat to echo the sample (default: {False})
+        """
+        message = pack_coordinates(sample, coords)
+        with self._lock:
+            sock = self._sock
+            if sock is None:
+                raise ConnectionError(
+                    "automat at {}:{} not connected".format(*self.address))
+            try:
+                # a closed connection would still accept the message into
+                # the send buffer and lose it
+                if peer_closed(sock):
+                    raise ConnectionError("connection closed by the automat")
+                sock.sendall(message)
+                if wait_ack:
+                    ack, = ACK.unpack(recv_exactly(sock, ACK.size))
+                    if ack != int(sample):
+                        raise ConnectionError(
+                            "automat acknowledged sample {}".format(ack))
+            except OSError as e:
+                sock.close()
+                self._sock = None
+                self._lost.set()
+                raise ConnectionError(str(e)) from e
+
+    def close(self):
+        self._running = False
+        self._drop()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description="send random paths to an automat (or automat_server.py) "
+                    "and report the throughput")
+    parser.add_argument("--ip", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10509)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--ack", action="store_true")
+    args = parser.parse_args()
+
+    coords = np.random.default_rng(0).uniform(0, 1000, (args.points, 2))
+    with AutomatConnection(args.ip, args.port) as connection:
+        while not connection.connected:
+            time.sleep(.1)
+        start = time.perf_counter()
+        for sample in range(args.messages):
+            connection.send(sample, coords, wait_ack=args.ack)
+        elapsed = time.perf_counter() - start
+    size = args.messages * len(pack_coordinates(0, coords))
+    print("{} messages in {:.3f} s, {:.0f} messages/s, {:.1f} MB/s".format(
+        args.messages, elapsed, args.messages / elapsed, size / elapsed / 1e6))
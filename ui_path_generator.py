@@ -1,50 +1,47 @@
-import yaml
 import os
 import cv2
 import PySimpleGUI as sg
-import numpy as np
-from path_generator import path_generation
+from background_model import BackgroundModel
+from calibration import Calibration
+from file_writer import FileWriter
+from frame_store import FrameStore
+from live_view import LiveView
+from path_generator import PathGenerator, StageTimer
+from path_planner import path_length
+from path_worker import PathWorker
+from sample_archive import SampleArchive, content_hash
 from camera import Camera
 #from dummy_camera import Camera
-import time
-from datetime import datetime
-import csv
-import socket
-from struct import *
+from transport import AutomatConnection
 
 
 TCP_IP="192.168.2.33"
 TCP_PORT=10509
+WAIT_ACK = False # wait for the automat to echo the sample number
+PREVIEW_LEVELS = 2 # pyramid levels below full resolution for the live preview
+LIVE_LEVELS = 2 # pyramid levels of the live view on the camera stream
+LIVE_FPS = 10 # rate of the live view, frames in between are dropped
+SLIDERS = ("-SPACING-", "-DILATION-", "-BG THRESH-")
+BACKGROUND_FRAMES = 16 # frames averaged into the background model
+TEXTILE_FRAMES = 4 # frames averaged for the textile image
+# durations archived per sample, capture and save include the background
+LOG_STAGES = ("capture", "segmentation", "margin", "scanlines", "ordering",
+              "pixel2world", "save", "send")
+# "png", "webp" (lossless) or "npy", IMAGE_LEVEL is the PNG compression
+# level, None selects the fast run length encoding
+IMAGE_FORMAT = "png"
+IMAGE_LEVEL = None
+# ".txt" (np.savetxt) or ".wpt" (binary with sample, calibration and
+# parameters in the header, see coordinate_io.py)
+COORDINATE_FORMAT = ".txt"
+PLANNER = "boustrophedon" # or "meander", see path_generation
+ALIGN_ROWS = False # turn the rows to the direction that needs the fewest rows
+PATH_TOLERANCE = None # merge waypoints within this many mm of a straight path
+BACKGROUND_MODEL = os.path.join("background", "model.npz")
+ARCHIVE = "archive.sqlite"
 
-def socket_to_automat(ip, port, print_retry):
-    currsocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM);
-    print(ip)
-    print(port)
-    try:        
-        currsocket.connect((ip, port))
-        currsocket.setblocking(0)
-        print("Socket connected");
-    except:
-        if print_retry:
-            print("Socket NOT connected, retrying")      
-        else: 
-            time.sleep(5)    
-            socket_to_automat(ip, port, False)
-    return currsocket
-
-def send_to_socket(asocket, sample, coord):
-    asocket.send(pack('i', int(sample))) 
-    asocket.send(pack('i', int(coord.shape[0]))) 
-    for iy, ix in np.ndindex(coord.shape):
-        curr_coordinate = int(np.round(coord[iy, ix],2)*100);
-        asocket.send(pack('i', curr_coordinate)) 
-        print("[" + str(iy) + "," + str(ix) + "]: " + str(coord[iy, ix]) +" -> " + str(curr_coordinate))
-
-
-def update_image(frame, w_gui_img, h_gui_img):
-    # Update image in GUI
-    frame = cv2.resize(frame, (w_gui_img, h_gui_img))
-    imgbytes = cv2.imencode(".ppm", frame)[1].tobytes()
+def show_image(imgbytes):
+    # Update image in GUI with a preview of the frame store
     a_id = graph_elem.draw_image(data=imgbytes, location=(0, 0))
     graph_elem.send_figure_to_back(a_id)
     return a_id
@@ -58,10 +55,10 @@ if __name__ == "__main__":
     os.makedirs("background", exist_ok=True)
     os.makedirs("textiles", exist_ok=True)
     os.makedirs("coordinates", exist_ok=True)
-    os.makedirs("log", exist_ok=True)
 
-    with open("calibration_matrix.yaml", "r") as f:
-        camera_dict = yaml.safe_load(f)
+    calibration = Calibration.from_yaml("calibration_matrix.yaml")
+    # keeps segmentation and margin results while only the sliders change
+    path_generator = PathGenerator(calibration)
 
     sg.theme("Black")
 
@@ -75,18 +72,20 @@ if __name__ == "__main__":
                 sg.Button("SHOW BACKGROUND IMG", size=(26, 1), key="-SHOW BACKGROUND-", disabled=True)],
                [sg.Button("CAPTURE TEXTILE", size=(26, 1), key="-TEXTILE-", disabled=True),
                 sg.Button("SHOW TEXTILE IMG", size=(26, 1), key="-SHOW TEXTILE-", disabled=True)],
-               [sg.Button("SHOW MASK IMG", size=(26, 1), key="-SHOW MASK-", disabled=True)],
+               [sg.Button("SHOW MASK IMG", size=(26, 1), key="-SHOW MASK-", disabled=True),
+                sg.Button("LIVE VIEW", size=(26, 1), key="-LIVE-", disabled=True)],
                [sg.Text("Spacing:\t", font=("Arial", 13)),
                 sg.Slider((10, 100), 20, 10, font=("Arial", 12), orientation="h",
-                   size=(40, 15), key="-SPACING-")],
+                   size=(40, 15), key="-SPACING-", enable_events=True)],
                [sg.Text("Dilation:\t", font=("Arial", 13)),
                 sg.Slider((1, 255), 1, 1, font=("Arial", 12), orientation="h",
-                   size=(40, 15), key="-DILATION-")],
+                   size=(40, 15), key="-DILATION-", enable_events=True)],
                [sg.Text("Thresh:\t", font=("Arial", 13)),
                 sg.Slider((1, 255), 50, 1, font=("Arial", 12), orientation="h",
-                   size=(40, 15), key="-BG THRESH-")],
+                   size=(40, 15), key="-BG THRESH-", enable_events=True)],
                [sg.Button("DRAW PATH", size=(26, 1), key="-DRAW GRID-", disabled=True),
-               sg.Button("SEND COORDINATES", size=(26, 1), key="-NEXT-", disabled=True)]]#,
+               sg.Button("SEND COORDINATES", size=(26, 1), key="-NEXT-", disabled=True)],
+               [sg.Text("", font=("Arial", 13), size=(50, 1), key="-PATH INFO-")]]#,
 #               [sg.Text("Coordinates: ", font=("Arial", 13)), 
 #                sg.InputText(size=(15,1),key="-X-"), sg.InputText(size=(15,1),key="-Y-")],
 #               [sg.Button("SEND COORDINATE", size=(26, 1), key="-SEND COORD-", disabled=False)]]
@@ -97,42 +96,65 @@ if __name__ == "__main__":
                        resizable=True, size=(w_gui, h_gui), finalize=True)
     graph_elem = window["-GRAPH-"]
     a_id = None
+    # plan on the full resolution once the slider is released
+    for slider in SLIDERS:
+        window[slider].bind("<ButtonRelease-1>", " RELEASE")
+    worker = PathWorker(path_generator, lambda tag, result:
+                        window.write_event_value("-PATH DONE-", (tag, result)))
 
     cam = Camera()
+    # segments the camera stream on a reduced resolution until the textile
+    # is captured
+    live = LiveView(cam, calibration,
+                    lambda: window.write_event_value("-LIVE FRAME-", None),
+                    LIVE_LEVELS, LIVE_FPS, (w_gui_img, h_gui_img))
+    # connects in the background and reconnects if the automat restarts
+    automat = AutomatConnection(TCP_IP, TCP_PORT)
+    # images and coordinates are written in the background
+    writer = FileWriter(IMAGE_FORMAT, IMAGE_LEVEL)
 
-    img = np.zeros((w, h, 3))
-    img_bg = np.zeros((w, h, 3))
-    a_id = update_image(img, w_gui_img, h_gui_img)
+    # uint8 buffers for the frames of a sample, reused for every sample
+    store = FrameStore((w_gui_img, h_gui_img), (h, w, 3))
+    img, img_bg = None, None
+    a_id = show_image(store.preview("textile"))
     bg_flag, textile_flag = False, False
-    now = datetime.now().strftime("%Y-%m-%d_%H-%M")
-    csvfile = open(os.path.join("log", "log_"+now+".csv"),"w", newline="")
-    log = csv.writer(csvfile, delimiter=",", quotechar="|", quoting=csv.QUOTE_MINIMAL)
-    log.writerow(["Sample Name", "Timestamp", "Spacing", "Dilation", "Background Threshold"])
+    # the background model is kept across samples and sessions
+    if os.path.exists(BACKGROUND_MODEL):
+        img_bg = store.set("background", BackgroundModel.load(BACKGROUND_MODEL).image)
+        live.set_background(img_bg)
+        bg_hash = content_hash(img_bg)
+        bg_flag = True
+    # index of all samples, replaces the CSV session logs
+    archive = SampleArchive(ARCHIVE)
+    # durations of the current sample, the planning stages are taken from
+    # the last full resolution run
+    sample_timer = StageTimer(enabled=True)
+    plan_timer = StageTimer(enabled=True)
     
-    mtx = np.asarray(camera_dict["camera_matrix"])
-    dist = np.asarray(camera_dict["dist_coeff"])
+    mtx = calibration.camera_matrix
+    dist = calibration.dist_coeff
     newcameramtx, roi = cv2.getOptimalNewCameraMatrix(mtx, dist, (w,h), 1, (w,h))
     
     while True:
-        event, values = window.read(timeout=0)
+        event, values = window.read()
         if event in ("Exit", None):
             window.close()
             break
 #        if event == "-SEND COORD-":
 #            coord = np.asarray([values["-X-"], values["-Y-"]]).reshape((1,2))
-#            coord = pixel2world(coord, camera_dict)
-#            asocket = socket_to_automat(TCP_IP, TCP_PORT, True)
-#            sample = "0";
-#            send_to_socket(asocket, sample, coord)
-#            asocket.close()
+#            coord = calibration.pixel2world(coord)
+#            automat.send("0", coord)
 
         if event == "-SAMPLE KEY-":
             if values["-SAMPLE-"] != "":
                 sample = values["-SAMPLE-"]
-                if os.path.exists(os.path.join("textiles", sample + ".png")):
+                if (archive.exists(sample) or os.path.exists(
+                        writer.image_filename(os.path.join("textiles", sample)))):
                     popup_button = sg.popup_yes_no('Warning, sample {} already exists!\nDo you want to overwrite it?'.format(sample), title="File Warning", background_color="Red")
                     if popup_button == "No":
                         sample = ""
+                        live.stop()
+                        window["-LIVE-"].update("LIVE VIEW", disabled=True)
                         window["-NEXT-"].update(disabled=True)
                         window["-TEXTILE-"].update(disabled=True)
                         window["-DRAW GRID-"].update(disabled=True)
@@ -143,53 +165,126 @@ if __name__ == "__main__":
                         window["-SAMPLE-"].update("")
                         window["-SHOW MASK-"].update(disabled=True)
                         textile_flag = False
-                        img = np.zeros((w, h, 3))
+                        store.clear("textile")
                         graph_elem.delete_figure(a_id)
                         continue
                 window["-TEXTILE-"].update(disabled=False)
                 window["-BACKGROUND-"].update(disabled=False)
                 window["-SAMPLE TEXT-"].update("SAMPLE: {}".format(sample))
-                if img_bg.sum()>0:
+                if store.has("background"):
                     window["-SHOW BACKGROUND-"].update(disabled=False)
+                    window["-LIVE-"].update(disabled=False)
+
+        if event in ("-BACKGROUND-", "-TEXTILE-") and live.running:
+            # the operator confirmed, capture at full resolution
+            live.stop()
+            window["-LIVE-"].update("LIVE VIEW")
 
         if event == "-BACKGROUND-":
-            img_bg = cam.capture()
+            # the running request may still read the buffer
+            worker.cancel(wait=True)
+            with sample_timer.stage("capture"):
+                bg_model = cam.capture_background(BACKGROUND_FRAMES)
+            with sample_timer.stage("save"):
+                # the buffer may still be queued for writing
+                writer.flush()
+                writer.write_file(BACKGROUND_MODEL, bg_model.save)
+            img_bg = store.set("background", bg_model.image)
+            live.set_background(img_bg)
+            bg_hash = content_hash(img_bg)
             graph_elem.delete_figure(a_id)
-            a_id = update_image(img_bg, w_gui_img, h_gui_img)
+            a_id = show_image(store.preview("background"))
             bg_flag = True
             window["-SHOW BACKGROUND-"].update(disabled=False)
+            window["-LIVE-"].update(disabled=False)
+
+        if event == "-LIVE-":
+            if live.running:
+                live.stop()
+                window["-LIVE-"].update("LIVE VIEW")
+            else:
+                live.set_params(values["-BG THRESH-"], values["-SPACING-"],
+                                values["-DILATION-"])
+                live.start()
+                window["-LIVE-"].update("STOP LIVE VIEW")
+
+        if event in SLIDERS and live.running:
+            live.set_params(values["-BG THRESH-"], values["-SPACING-"],
+                            values["-DILATION-"])
+
+        if event == "-LIVE FRAME-" and live.running:
+            result = live.result()
+            if isinstance(result, Exception):
+                print("Live view stopped: {}".format(result))
+                live.stop()
+                window["-LIVE-"].update("LIVE VIEW")
+            elif result is not None:
+                overlay, n_waypoints, length = result
+                graph_elem.delete_figure(a_id)
+                a_id = show_image(cv2.imencode(".ppm", overlay)[1].tobytes())
+                window["-PATH INFO-"].update(
+                    "Live: {} waypoints, {:.0f} mm travel".format(n_waypoints, length))
 
         if event == "-TEXTILE-":
-            img = cam.capture()
+            # the running request may still read the buffer
+            worker.cancel(wait=True)
+            with sample_timer.stage("capture"):
+                frame = cam.capture_average(TEXTILE_FRAMES)
+            with sample_timer.stage("save"):
+                writer.flush()
+            img = store.set("textile", frame)
+            textile_hash = content_hash(img)
             graph_elem.delete_figure(a_id)
-            a_id = update_image(img, w_gui_img, h_gui_img)
+            a_id = show_image(store.preview("textile"))
             textile_flag = True
             window["-SHOW TEXTILE-"].update(disabled=False)
 
         if event == "-SHOW BACKGROUND-":
             graph_elem.delete_figure(a_id)
-            a_id = update_image(img_bg, w_gui_img, h_gui_img)
+            a_id = show_image(store.preview("background"))
 
         if event == "-SHOW TEXTILE-":
             graph_elem.delete_figure(a_id)
-            a_id = update_image(img, w_gui_img, h_gui_img)
+            a_id = show_image(store.preview("textile"))
             
         if event == "-SHOW MASK-":
             graph_elem.delete_figure(a_id)
-            if len(img_mask.shape)==2:
-                img_mask = cv2.cvtColor(img_mask, cv2.COLOR_GRAY2BGR)
-            a_id = update_image(img_mask, w_gui_img, h_gui_img)
+            a_id = show_image(store.preview("mask"))
 
         if textile_flag and bg_flag:
             window["-DRAW GRID-"].update(disabled=False)
 
         if event == "-NEXT-":
-            asocket = socket_to_automat(TCP_IP, TCP_PORT, True)
-            send_to_socket(asocket, sample, world_coords)
-            asocket.close()
-            log.writerow([sample, datetime.now(), values["-SPACING-"], 
-                          values["-DILATION-"], values["-BG THRESH-"]])
-            csvfile.flush()
+            with sample_timer.stage("save"):
+                writer.flush()
+            failed = writer.pop_failed()
+            if failed:
+                # nothing is sent or archived, DRAW PATH writes the files again
+                sg.popup_error("Saving sample {} failed:\n{}".format(
+                    sample, "\n".join(failed)), title="File Error")
+                window["-NEXT-"].update(disabled=True)
+                continue
+            try:
+                with sample_timer.stage("send"):
+                    automat.send(sample, world_coords, wait_ack=WAIT_ACK)
+            except ConnectionError as e:
+                # the sample is kept, so sending can be repeated
+                print("Sending coordinates failed: {}".format(e))
+                sg.popup_error("Sending coordinates of sample {} failed:\n{}".format(
+                    sample, e), title="Automat Error")
+                continue
+            worker.cancel()
+            durations = dict(sample_timer.durations, **plan_timer.durations)
+            archive.add_sample(
+                sample, world_coords, spacing=values["-SPACING-"],
+                dilation=values["-DILATION-"], bg_thresh=values["-BG THRESH-"],
+                planner=PLANNER, align=ALIGN_ROWS, tolerance=PATH_TOLERANCE,
+                textile_file=textile_file,
+                textile_hash=textile_hash, background_file=background_file,
+                background_hash=bg_hash, coordinates_file=coord_filename,
+                timings={stage: round(durations.get(stage, 0.), 4)
+                         for stage in LOG_STAGES})
+            sample_timer.reset()
             window["-NEXT-"].update(disabled=True)
             window["-TEXTILE-"].update(disabled=True)
             window["-DRAW GRID-"].update(disabled=True)
@@ -199,29 +294,88 @@ if __name__ == "__main__":
             window["-SAMPLE TEXT-"].update("SAMPLE: ")
             window["-SAMPLE-"].update("")
             window["-SHOW MASK-"].update(disabled=True)
+            window["-PATH INFO-"].update("")
+            live.stop()
+            window["-LIVE-"].update("LIVE VIEW", disabled=True)
             textile_flag = False
-            img = np.zeros((w, h, 3))
+            for frame_name in ("textile", "mask", "path"):
+                store.clear(frame_name)
             graph_elem.delete_figure(a_id)
             sample = ""
             
-        if event == "-DRAW GRID-":
-            try:
-                vis_img, world_coords, img_mask = path_generation(
-                camera_dict, img, img_bg, spacing=values["-SPACING-"], 
-                dilation=values["-DILATION-"], bg_thresh=values["-BG THRESH-"])
-            except:
+        if textile_flag and bg_flag and (event in SLIDERS or event == "-DRAW GRID-"
+                                         or event in [k + " RELEASE" for k in SLIDERS]):
+            # while a slider moves only a decimated preview is planned, a
+            # released slider plans the full resolution and only DRAW PATH
+            # saves the files and enables sending
+            preview = event in SLIDERS
+            kind = ("preview" if preview else
+                    "save" if event == "-DRAW GRID-" else "full")
+            if not preview:
+                window["-NEXT-"].update(disabled=True)
+                # a fresh timer per run, a cancelled run keeps its own
+                plan_timer = StageTimer(enabled=True)
+                plan_stats = {}
+            # the sample tells results of a previous sample apart, which may
+            # already be queued as events
+            worker.submit((kind, sample), img, img_bg,
+                          spacing=values["-SPACING-"], dilation=values["-DILATION-"],
+                          bg_thresh=values["-BG THRESH-"],
+                          levels=PREVIEW_LEVELS if preview else 0,
+                          planner=PLANNER, align=ALIGN_ROWS,
+                          tolerance=PATH_TOLERANCE,
+                          timer=StageTimer() if preview else plan_timer,
+                          stats=None if preview else plan_stats)
+
+        if event == "-PATH DONE-":
+            (kind, path_sample), result = values["-PATH DONE-"]
+            if path_sample != sample:
+                continue
+            if isinstance(result, Exception):
                 print("Path Generation Failed")
                 continue
+            vis_img, path_coords, path_mask = result
+            store.set("path", vis_img)
             graph_elem.delete_figure(a_id)
-            a_id = update_image(vis_img, w_gui_img, h_gui_img)
+            a_id = show_image(store.preview("path"))
+            window["-PATH INFO-"].update("{}: {} waypoints, {:.0f} mm travel".format(
+                "Preview" if kind == "preview" else "Path",
+                path_coords.shape[0], path_length(path_coords)))
+            if kind == "preview":
+                continue
+            if ALIGN_ROWS or PATH_TOLERANCE:
+                window["-PATH INFO-"].update(
+                    "Path: {waypoints} waypoints ({waypoints_before} before), "
+                    "{length:.0f} mm travel ({length_before:.0f} mm before)".format(
+                        **plan_stats))
+            if kind != "save":
+                continue
+            world_coords = path_coords
+            store.set("mask", path_mask)
             window["-NEXT-"].update(disabled=False)
-            coord_filename = os.path.join("coordinates", sample + ".txt")
-            cv2.imwrite(os.path.join("background", sample + ".png"), img_bg)
-            cv2.imwrite(os.path.join("textiles", sample + ".png"), img)
-            np.savetxt(coord_filename, world_coords, fmt="%10.5f")
+            coord_filename = os.path.join("coordinates", sample + COORDINATE_FORMAT)
+            with sample_timer.stage("save"):
+                # the background is linked to the previous sample's file
+                # while it has not been captured again
+                background_file = writer.write_image(
+                    os.path.join("background", sample), img_bg, unchanged=True)
+                textile_file = writer.write_image(
+                    os.path.join("textiles", sample), img)
+                writer.write_coordinates(
+                    coord_filename, world_coords, sample=sample,
+                    calibration=calibration,
+                    params={"spacing": values["-SPACING-"],
+                            "dilation": values["-DILATION-"],
+                            "bg_thresh": values["-BG THRESH-"],
+                            "planner": PLANNER, "align": ALIGN_ROWS,
+                            "tolerance": PATH_TOLERANCE})
             window["-SHOW MASK-"].update(disabled=False)
 
 
-    csvfile.close()  
+    worker.stop()
+    live.stop()
+    writer.close()
+    automat.close()
+    archive.close()
     cam.destroy()
     window.close()